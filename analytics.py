@@ -0,0 +1,132 @@
+import numpy as np
+
+from dashboard import get_time_range
+from palette import QUADRANTS
+from storage import DB_FILE, get_connection
+
+SECONDS_PER_DAY = 86400
+
+# Rolling averages span this many calendar days
+ROLLING_DAYS = 7
+
+# Heatmap grid over the -100..100 square (HEATMAP_BINS x HEATMAP_BINS cells)
+HEATMAP_BINS = 10
+
+
+def load_coordinates(time_period='week', db_file=DB_FILE):
+    """
+    Fetch (ts_epoch, x, y) for every entry with coordinates in one query.
+
+    Returns:
+        numpy.ndarray: float64 array of shape (n, 3), ordered by time
+    """
+    start_ts, end_ts = get_time_range(time_period)
+    rows = get_connection(db_file).execute('''
+    SELECT ts_epoch, x_coordinate, y_coordinate
+    FROM journal_entries
+    WHERE ts_epoch BETWEEN ? AND ?
+      AND x_coordinate IS NOT NULL AND y_coordinate IS NOT NULL
+    ORDER BY ts_epoch
+    ''', (start_ts, end_ts)).fetchall()
+    return np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+
+def quadrant_index(x, y):
+    """Vectorized palette.quadrant_index for arrays of coordinates"""
+    return (np.asarray(x) < 0).astype(np.intp) + 2 * (np.asarray(y) < 0)
+
+
+def rolling_averages(ts, x, y, days=ROLLING_DAYS):
+    """
+    Daily valence/arousal means over a trailing window of calendar days.
+
+    Entries are binned per day with bincount, then windowed sums come from a
+    cumulative sum, so the cost is linear in entries plus days.
+    """
+    day = (ts // SECONDS_PER_DAY - ts[0] // SECONDS_PER_DAY).astype(np.intp)
+    span = day[-1] + 1
+
+    counts = np.bincount(day, minlength=span).astype(np.float64)
+    sums_x = np.bincount(day, weights=x, minlength=span)
+    sums_y = np.bincount(day, weights=y, minlength=span)
+
+    def window(values):
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        return cumulative[days:] - cumulative[:-days]
+
+    # Pad the front so each day's window includes the days before the first entry
+    pad = np.zeros(days - 1)
+    window_counts = window(np.concatenate((pad, counts)))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = window(np.concatenate((pad, sums_x))) / window_counts
+        mean_y = window(np.concatenate((pad, sums_y))) / window_counts
+
+    first_day = ts[0] - ts[0] % SECONDS_PER_DAY
+    has_data = window_counts > 0
+    return {
+        'day_start': (first_day + np.arange(span)[has_data] * SECONDS_PER_DAY).astype(np.int64).tolist(),
+        'valence': np.round(mean_x[has_data], 2).tolist(),
+        'arousal': np.round(mean_y[has_data], 2).tolist(),
+    }
+
+
+def volatility(x, y):
+    """Standard deviation and RMSSD (root mean square of successive differences) per axis"""
+    def rmssd(values):
+        return float(np.sqrt(np.mean(np.diff(values) ** 2))) if len(values) > 1 else 0.0
+
+    return {
+        'valence_std': round(float(np.std(x)), 2),
+        'arousal_std': round(float(np.std(y)), 2),
+        'valence_rmssd': round(rmssd(x), 2),
+        'arousal_rmssd': round(rmssd(y), 2),
+    }
+
+
+def quadrant_dwell(ts, x, y, end_ts):
+    """
+    Seconds and share of time spent in each quadrant.
+
+    Each entry's mood is taken to last until the next entry; the last one lasts
+    until end_ts.
+    """
+    dwell = np.diff(np.append(ts, max(end_ts, ts[-1])))
+    seconds = np.bincount(quadrant_index(x, y), weights=dwell, minlength=len(QUADRANTS))
+    total = seconds.sum()
+    share = seconds / total if total else np.zeros(len(QUADRANTS))
+    return [
+        {'quadrant': name, 'seconds': int(secs), 'share': round(float(part), 4)}
+        for name, secs, part in zip(QUADRANTS, seconds, share)
+    ]
+
+
+def density_heatmap(x, y, bins=HEATMAP_BINS):
+    """Entry counts on a bins x bins grid; rows run from low to high energy"""
+    counts, _, _ = np.histogram2d(y, x, bins=bins, range=[[-100, 100], [-100, 100]])
+    return counts.astype(np.int64).tolist()
+
+
+def get_emotion_analytics(time_period='week', db_file=DB_FILE):
+    """
+    Emotion-space analytics for the dashboard over one time period.
+
+    Returns:
+        dict: entry count, mean position, rolling averages, volatility,
+              quadrant dwell time and a density heatmap
+    """
+    data = load_coordinates(time_period, db_file)
+    if len(data) == 0:
+        return {'count': 0, 'time_period': time_period}
+
+    ts, x, y = data[:, 0], data[:, 1], data[:, 2]
+    _, end_ts = get_time_range(time_period)
+
+    return {
+        'count': len(data),
+        'time_period': time_period,
+        'mean': {'valence': round(float(x.mean()), 2), 'arousal': round(float(y.mean()), 2)},
+        'rolling': rolling_averages(ts, x, y),
+        'volatility': volatility(x, y),
+        'quadrant_dwell': quadrant_dwell(ts, x, y, end_ts),
+        'heatmap': {'bins': HEATMAP_BINS, 'counts': density_heatmap(x, y)},
+    }
@@ -1,46 +1,159 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-import sqlite3
-from datetime import datetime, timedelta
+from flask import Flask, Response, g, render_template, request, jsonify, redirect, url_for, stream_with_context
 import json
 from mood_picker import MoodCoordinateMapper
-from prompt_gen import generate_prompt, save_entry, create_db
+from mood_resolver import resolver_stats, default_resolver
+from storage import create_db
+from dashboard import get_dashboard, list_entries, get_entry, PAGE_SIZE
+from search import search_entries, SEARCH_LIMIT
+from palette import annotate_entries
+from http_cache import cached_view, response_cache
+from prompt_pool import get_prompt, stream_prompt, start_pool, default_pool
+from ingest import enqueue_entry
+from journal_io import export_entries, FORMATS, MIMETYPES
+from shards import db_for_user, request_user, USER_HEADER
+from metrics import registry, render_metrics
+from profiling import init_profiling, phase
 
 app = Flask(__name__)
 
+# Per-request phase timings and slow-request log, when MOODJOURNAL_PROFILE is set
+init_profiling(app)
+
+# Upper bound on coordinate pairs accepted by /get_emotion/batch
+MAX_BATCH_POINTS = 1000
+
 # Ensure database exists
 create_db()
 
-def get_color_from_coordinates(x, y):
-    """Generate a color based on x,y coordinates"""
-    # Normalize coordinates from -100,100 to 0,1 range
-    x_norm = (x + 100) / 200
-    y_norm = (y + 100) / 200
-    
-    # Make colors more vibrant by increasing saturation
-    h = (x_norm * 360) % 360  # Hue based on x (negative to positive)
-    s = 0.7  # Fixed saturation
-    l = 0.2 + (y_norm * 0.6)  # Lightness based on y (low to high energy)
-    
-    return f"hsl({h}, {s*100}%, {l*100}%)"
+# Components that keep their own counters are read at scrape time
+registry.collector(
+    "moodjournal_mood_resolver_lookups_total", "Coordinate-to-mood lookups by where they were answered",
+    "result", lambda: dict(default_resolver.counters)
+)
+registry.collector(
+    "moodjournal_prompt_pool_events_total", "Prompt pool takes (hits/misses) and background generations",
+    "event", lambda: dict(default_pool.counters)
+)
+registry.collector(
+    "moodjournal_http_cache_requests_total", "Cached page requests by how they were served",
+    "result", lambda: dict(response_cache.counters)
+)
+
+# Shared mood mapper, created on first use
+_mood_mapper = None
+
+def get_mood_mapper():
+    """Return the process-wide MoodCoordinateMapper"""
+    global _mood_mapper
+    if _mood_mapper is None:
+        _mood_mapper = MoodCoordinateMapper()
+    return _mood_mapper
+
+@app.before_request
+def warm_prompt_pool():
+    """Start filling the prompt pool on the first request, so /get_prompt rarely waits on the API"""
+    start_pool()
+
+@app.before_request
+def select_journal():
+    """Route the request to the journal database of the user named by the trusted proxy"""
+    try:
+        g.journal_user = request_user(request.headers.get(USER_HEADER), request.remote_addr)
+        g.db_file = db_for_user(g.journal_user)
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 403
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 @app.route('/')
+@cached_view
 def home():
     """Render the main page with journal entries and mood chart"""
     # Get time period from query params, default to 'week'
     time_period = request.args.get('time_period', 'week')
     
-    # Get journal entries
-    entries = get_journal_entries(time_period)
+    # Entries plus pre-bucketed chart data, sharing one date-range calculation
+    dashboard = get_dashboard(time_period, g.db_file)
     
-    # Get emotion data for chart
-    emotion_data = get_emotion_data(time_period)
+    with phase('serialize'):
+        emotion_data = json.dumps(dashboard['emotion_data'])
     
     return render_template(
         'index.html', 
-        entries=entries, 
-        emotion_data=json.dumps(emotion_data),
+        entries=annotate_entries(dashboard['entries']), 
+        next_cursor=dashboard['next_cursor'],
+        emotion_data=emotion_data,
         selected_period=time_period,
-        get_color_from_coordinates=get_color_from_coordinates
+        journal_user=g.journal_user
+    )
+
+@app.route('/entries')
+@cached_view
+def list_journal_entries():
+    """Page through entry summaries, newest first, using a keyset cursor"""
+    time_period = request.args.get('time_period', 'week')
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', PAGE_SIZE, type=int)
+    
+    try:
+        page = list_entries(time_period, cursor, limit, g.db_file)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    annotate_entries(page['entries'])
+    return jsonify(page)
+
+@app.route('/entries/<int:entry_id>')
+def get_journal_entry(entry_id):
+    """Get one entry including its full response"""
+    entry = get_entry(entry_id, g.db_file)
+    if entry is None:
+        return jsonify({'error': 'Entry not found'}), 404
+    return jsonify(entry)
+
+@app.route('/entries/<int:entry_id>/related')
+def get_related_entries(entry_id):
+    """Past entries most similar to this one in wording, from the similarity index"""
+    # numpy is only imported once related entries are first requested
+    from similarity import related_entries, RELATED_LIMIT
+    
+    if get_entry(entry_id, g.db_file) is None:
+        return jsonify({'error': 'Entry not found'}), 404
+    limit = request.args.get('limit', RELATED_LIMIT, type=int)
+    return jsonify({'entry_id': entry_id, 'results': related_entries(entry_id, limit, g.db_file)})
+
+@app.route('/analytics')
+@cached_view
+def emotion_analytics():
+    """Rolling averages, volatility, quadrant dwell time and density over stored coordinates"""
+    # numpy is only imported once analytics are first requested
+    from analytics import get_emotion_analytics
+    
+    time_period = request.args.get('time_period', 'week')
+    return jsonify(get_emotion_analytics(time_period, g.db_file))
+
+@app.route('/search')
+def search_journal():
+    """Full-text search over past prompts and responses, ranked by relevance"""
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', SEARCH_LIMIT, type=int)
+    
+    if not query:
+        return jsonify({'error': 'Search query is required'}), 400
+    
+    return jsonify({'query': query, 'results': search_entries(query, limit, g.db_file)})
+
+@app.route('/export')
+def export_journal():
+    """Download the whole journal as JSONL or CSV, streamed in chunks"""
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
+    
+    return Response(
+        stream_with_context(export_entries(fmt, g.db_file)),
+        mimetype=MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename=journal.{fmt}'}
     )
 
 @app.route('/get_emotion', methods=['POST'])
@@ -54,8 +167,7 @@ def get_emotion():
             y = data['coordinates']['y']
             
             try:
-                mapper = MoodCoordinateMapper()
-                emotion = mapper.get_mood_from_coordinates(x, y)
+                emotion = get_mood_mapper().get_mood_from_coordinates(x, y)
                 return jsonify({'emotion': emotion, 'coordinates': {'x': x, 'y': y}})
             except Exception as e:
                 app.logger.error(f"Error getting mood from coordinates: {str(e)}")
@@ -69,6 +181,45 @@ def get_emotion():
         app.logger.error(f"Error in get_emotion endpoint: {str(e)}")
         return jsonify({'error': 'Server error processing request'}), 500
 
+@app.route('/get_emotion/batch', methods=['POST'])
+def get_emotion_batch():
+    """Get emotions for many coordinate pairs in one call, in input order"""
+    try:
+        data = request.json
+        points = data.get('points')
+        
+        if not isinstance(points, list) or not points:
+            return jsonify({'error': 'Invalid request - points must be a non-empty list'}), 400
+        if len(points) > MAX_BATCH_POINTS:
+            return jsonify({'error': f'Too many points - at most {MAX_BATCH_POINTS} per request'}), 400
+        
+        try:
+            coordinates = [(point['x'], point['y']) for point in points]
+            emotions = get_mood_mapper().get_moods_batch(coordinates)
+        except (KeyError, TypeError):
+            return jsonify({'error': 'Invalid request - every point needs x and y'}), 400
+        except Exception as e:
+            app.logger.error(f"Error getting moods for batch: {str(e)}")
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'results': [
+            {'emotion': emotion, 'coordinates': {'x': x, 'y': y}}
+            for emotion, (x, y) in zip(emotions, coordinates)
+        ]})
+    except Exception as e:
+        app.logger.error(f"Error in get_emotion/batch endpoint: {str(e)}")
+        return jsonify({'error': 'Server error processing request'}), 500
+
+@app.route('/metrics')
+def metrics():
+    """LLM latency, token and fallback metrics plus cache counters, in Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/get_emotion/stats')
+def get_emotion_stats():
+    """Expose hit/miss counters of the coordinate-to-mood resolver"""
+    return jsonify(resolver_stats())
+
 @app.route('/get_prompt', methods=['POST'])
 def get_journal_prompt():
     """Get a journal prompt based on emotion"""
@@ -79,12 +230,44 @@ def get_journal_prompt():
         if not emotion:
             return jsonify({'error': 'Emotion is required'}), 400
         
-        prompt = generate_prompt(emotion)
+        prompt = get_prompt(emotion, g.db_file)
         return jsonify({'prompt': prompt})
     except Exception as e:
         app.logger.error(f"Error in get_prompt endpoint: {str(e)}")
         return jsonify({'error': 'Server error generating prompt'}), 500
 
+# Stop clients and proxies from caching or buffering event streams
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def prompt_event(event):
+    """Server-sent event for one ("token", text) or ("done", prompt, source) stream_prompt event"""
+    kind, *rest = event
+    if kind == 'token':
+        return sse_event('token', {'text': rest[0]})
+    prompt, source = rest
+    return sse_event('done', {'prompt': prompt, 'source': source})
+
+@app.route('/get_prompt/stream')
+def stream_journal_prompt():
+    """Stream a journal prompt token by token as server-sent events"""
+    emotion = request.args.get('emotion', '').strip()
+    if not emotion:
+        return jsonify({'error': 'Emotion is required'}), 400
+    
+    def events():
+        for event in stream_prompt(emotion, g.db_file):
+            yield prompt_event(event)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
 @app.route('/save_entry', methods=['POST'])
 def save_journal_entry():
     """Save journal entry to database"""
@@ -104,92 +287,12 @@ def save_journal_entry():
             x_coordinate = coordinates['x']
             y_coordinate = coordinates['y']
             
-        save_entry(emotion, prompt, response, x_coordinate, y_coordinate)
+        # Group-committed by the ingest queue; waits for the commit unless
+        # INGEST_DURABILITY=enqueue
+        enqueue_entry(emotion, prompt, response, x_coordinate, y_coordinate, g.db_file)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def get_journal_entries(time_period='week'):
-    """Get journal entries for the specified time period"""
-    conn = sqlite3.connect('journal.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Calculate date range based on time period
-    end_date = datetime.now()
-    
-    if time_period == 'week':
-        start_date = end_date - timedelta(days=7)
-    elif time_period == 'month':
-        start_date = end_date - timedelta(days=30)
-    elif time_period == 'year':
-        start_date = end_date - timedelta(days=365)
-    else:  # all time
-        start_date = datetime.strptime('1970-01-01', '%Y-%m-%d')
-    
-    # Format dates for SQLite query
-    start_str = start_date.strftime('%Y-%m-%d %H:%M:%S')
-    end_str = end_date.strftime('%Y-%m-%d %H:%M:%S')
-    
-    cursor.execute('''
-    SELECT id, timestamp, emotion, prompt, response, x_coordinate, y_coordinate
-    FROM journal_entries
-    WHERE timestamp BETWEEN ? AND ?
-    ORDER BY timestamp DESC
-    ''', (start_str, end_str))
-    
-    entries = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    return entries
-
-def get_emotion_data(time_period='week'):
-    """Get emotion data for chart visualization"""
-    conn = sqlite3.connect('journal.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Calculate date range based on time period
-    end_date = datetime.now()
-    
-    if time_period == 'week':
-        start_date = end_date - timedelta(days=7)
-    elif time_period == 'month':
-        start_date = end_date - timedelta(days=30)
-    elif time_period == 'year':
-        start_date = end_date - timedelta(days=365)
-    else:  # all time
-        start_date = datetime.strptime('1970-01-01', '%Y-%m-%d')
-    
-    # Format dates for SQLite query
-    start_str = start_date.strftime('%Y-%m-%d %H:%M:%S')
-    end_str = end_date.strftime('%Y-%m-%d %H:%M:%S')
-    
-    cursor.execute('''
-    SELECT emotion, COUNT(*) as count, timestamp
-    FROM journal_entries
-    WHERE timestamp BETWEEN ? AND ?
-    GROUP BY emotion
-    ORDER BY count DESC
-    ''', (start_str, end_str))
-    
-    emotions = [dict(row) for row in cursor.fetchall()]
-    
-    # Get all entries for timeline data
-    cursor.execute('''
-    SELECT emotion, timestamp
-    FROM journal_entries
-    WHERE timestamp BETWEEN ? AND ?
-    ORDER BY timestamp
-    ''', (start_str, end_str))
-    
-    timeline = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    return {
-        'emotions': emotions,
-        'timeline': timeline
-    }
-
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
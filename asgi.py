@@ -0,0 +1,345 @@
+"""
+ASGI entry point for the mood journal.
+
+The LLM-bound routes (/get_emotion, /get_prompt and /get_prompt/stream) are
+served natively with asyncio so a single process can hold hundreds of
+in-flight OpenRouter calls.
+Every other route is delegated to the Flask app unchanged, on a pool of
+WSGI_THREADS threads so slow requests (exports, analytics, saves waiting on
+the ingest commit) run side by side instead of queueing behind each other.
+
+Run with any ASGI server, e.g. `uvicorn asgi:app`.
+"""
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+from urllib.parse import parse_qs
+
+from app import app as flask_app, get_mood_mapper, prompt_event, SSE_HEADERS
+from llm_client import get_async_client
+from prompt_gen import generate_prompt_async, stream_prompt_async
+from prompt_pool import default_pool, recent_prompt_filter, start_pool
+from ingest import shutdown_queues
+from shards import db_for_user, request_user, USER_HEADER
+
+# Threads running Flask requests for routes that aren't served natively
+WSGI_THREADS = int(os.getenv("MOODJOURNAL_WSGI_THREADS", "16"))
+
+wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+# Request bodies larger than this are spooled to a temporary file
+WSGI_BODY_SPOOL_BYTES = 65536
+
+
+class ThreadPoolWsgiToAsgi:
+    """
+    Serve a WSGI app over ASGI, one request per thread of an executor.
+
+    Flask requests are independent, so concurrent ones run side by side on the
+    pool instead of queueing on a single shared thread. Response chunks are
+    sent as the app yields them, so streamed responses stay streamed.
+    """
+
+    def __init__(self, wsgi_application, executor):
+        self.wsgi_application = wsgi_application
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError(f"WSGI fallback cannot serve {scope['type']!r} connections")
+
+        with SpooledTemporaryFile(max_size=WSGI_BODY_SPOOL_BYTES) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            loop = asyncio.get_running_loop()
+
+            def sync_send(message):
+                asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+            await loop.run_in_executor(self.executor, self.run_wsgi_app, scope, body, sync_send)
+
+    def run_wsgi_app(self, scope, body, sync_send):
+        """Call the WSGI app on the current thread and send its response."""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['start'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+            }
+
+        def send_start():
+            if not response.get('sent'):
+                sync_send(response['start'])
+                response['sent'] = True
+
+        result = self.wsgi_application(wsgi_environ(scope, body), start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    send_start()
+                    sync_send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            send_start()
+            sync_send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+def wsgi_environ(scope, body):
+    """PEP 3333 environ for an ASGI HTTP scope"""
+    path = scope['path']
+    root_path = scope.get('root_path', '')
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # WSGI strings carry the raw bytes as latin-1
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+        environ['REMOTE_PORT'] = str(scope['client'][1])
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+wsgi_app = ThreadPoolWsgiToAsgi(flask_app, wsgi_executor)
+
+
+async def get_emotion(data, db_file):
+    """Async twin of app.get_emotion, same JSON contract"""
+    try:
+        if 'coordinates' in data:
+            x = data['coordinates']['x']
+            y = data['coordinates']['y']
+
+            try:
+                emotion = await get_mood_mapper().get_mood_from_coordinates_async(x, y)
+                return {'emotion': emotion, 'coordinates': {'x': x, 'y': y}}, 200
+            except Exception as e:
+                flask_app.logger.error(f"Error getting mood from coordinates: {str(e)}")
+                return {'error': str(e)}, 400
+
+        elif 'emotion' in data:
+            return {'emotion': data['emotion'].capitalize()}, 200
+
+        return {'error': 'Invalid request - missing emotion or coordinates'}, 400
+    except Exception as e:
+        flask_app.logger.error(f"Error in get_emotion endpoint: {str(e)}")
+        return {'error': 'Server error processing request'}, 500
+
+
+async def get_journal_prompt(data, db_file):
+    """Async twin of app.get_journal_prompt, same JSON contract"""
+    try:
+        emotion = data.get('emotion')
+
+        if not emotion:
+            return {'error': 'Emotion is required'}, 400
+
+        # Reads the journal's similarity index, so off the event loop
+        is_fresh = await asyncio.to_thread(recent_prompt_filter, db_file)
+        prompt = default_pool.take(emotion, is_fresh)
+        if prompt is None:
+            prompt = await generate_prompt_async(emotion, is_fresh)
+        return {'prompt': prompt}, 200
+    except Exception as e:
+        flask_app.logger.error(f"Error in get_prompt endpoint: {str(e)}")
+        return {'error': 'Server error generating prompt'}, 500
+
+
+async def stream_journal_prompt(query, db_file):
+    """
+    Async twin of app.stream_journal_prompt.
+
+    Returns:
+        tuple: (error payload, status), or (async iterator of SSE strings, 200)
+    """
+    emotion = query.get('emotion', [''])[0].strip()
+    if not emotion:
+        return {'error': 'Emotion is required'}, 400
+
+    is_fresh = await asyncio.to_thread(recent_prompt_filter, db_file)
+    prompt = default_pool.take(emotion, is_fresh)
+
+    async def events():
+        if prompt is not None:
+            yield prompt_event(('done', prompt, 'pool'))
+            return
+        async for event in stream_prompt_async(emotion, is_fresh):
+            yield prompt_event(event)
+
+    return events(), 200
+
+
+ASYNC_ROUTES = {
+    ('POST', '/get_emotion'): (get_emotion, 'Server error processing request'),
+    ('POST', '/get_prompt'): (get_journal_prompt, 'Server error generating prompt'),
+}
+
+# Native routes answering GET with a server-sent event stream; handlers take
+# the parsed query string
+STREAM_ROUTES = {
+    ('GET', '/get_prompt/stream'): stream_journal_prompt,
+}
+
+
+def header(scope, name):
+    """Value of a request header from an ASGI scope, or None"""
+    name = name.lower().encode('latin-1')
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def read_body(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+
+async def send_json(send, payload, status):
+    body = (json.dumps(payload) + '\n').encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_events(receive, send, events):
+    """
+    Send an async iterator of server-sent events as a streamed response.
+
+    Stops reading events, and so closes the upstream LLM stream, as soon as
+    the client disconnects.
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream; charset=utf-8')] + [
+            (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in SSE_HEADERS.items()
+        ],
+    })
+
+    async def pump():
+        async for event in events:
+            await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    streaming = asyncio.ensure_future(pump())
+    watching = asyncio.ensure_future(disconnected())
+    try:
+        await asyncio.wait({streaming, watching}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (streaming, watching):
+            task.cancel()
+        await asyncio.gather(streaming, watching, return_exceptions=True)
+    if not streaming.cancelled():
+        streaming.result()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            start_pool()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await get_async_client().aclose()
+            # Commit entries still waiting in the write-behind queue
+            await asyncio.to_thread(shutdown_queues)
+            wsgi_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application callable"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    key = (scope.get('method'), scope.get('path'))
+    route = ASYNC_ROUTES.get(key)
+    stream_handler = STREAM_ROUTES.get(key)
+    if scope['type'] != 'http' or (route is None and stream_handler is None):
+        await wsgi_app(scope, receive, send)
+        return
+
+    client = scope.get('client')
+    try:
+        db_file = db_for_user(request_user(header(scope, USER_HEADER), client[0] if client else None))
+    except PermissionError as e:
+        # Same answers as the Flask app's select_journal hook
+        await send_json(send, {'error': str(e)}, 403)
+        return
+    except ValueError as e:
+        await send_json(send, {'error': str(e)}, 400)
+        return
+
+    if stream_handler is not None:
+        await read_body(receive)
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        events, status = await stream_handler(query, db_file)
+        if status != 200:
+            await send_json(send, events, status)
+            return
+        await send_events(receive, send, events)
+        return
+
+    handler, server_error = route
+    try:
+        data = json.loads(await read_body(receive))
+    except ValueError:
+        # Flask rejects unparseable bodies, which the sync routes report as a server error
+        await send_json(send, {'error': server_error}, 500)
+        return
+
+    payload, status = await handler(data, db_file)
+    await send_json(send, payload, status)
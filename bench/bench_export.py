@@ -0,0 +1,77 @@
+"""
+Streaming export/import round trip on a synthetic journal.
+
+Fills a scratch database with N entries (100k by default), exports it as JSONL
+and CSV to scratch files, then imports each file into an empty database. Reports
+rows per second and the peak Python heap (tracemalloc) of every step, which
+should stay flat as N grows.
+
+    python bench/bench_export.py --entries 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from generate import fill_journal
+from journal_io import FORMATS, export_entries, import_entries
+
+
+def measured(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    args = parser.parse_args()
+
+    results = {"entries": args.entries}
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.db")
+        fill_journal(source, args.entries)
+
+        for fmt in FORMATS:
+            path = os.path.join(tmp, f"journal.{fmt}")
+
+            def export():
+                with open(path, "w", encoding="utf-8", newline="") as f:
+                    for chunk in export_entries(fmt, source):
+                        f.write(chunk)
+
+            def load():
+                with open(path, encoding="utf-8", newline="") as f:
+                    return import_entries(f, fmt, target)
+
+            target = os.path.join(tmp, f"target_{fmt}.db")
+            storage.create_db(target)
+            _, export_seconds, export_peak = measured(export)
+            imported, import_seconds, import_peak = measured(load)
+            assert imported == args.entries, (imported, args.entries)
+
+            results[fmt] = {
+                "file_mb": round(os.path.getsize(path) / 2 ** 20, 1),
+                "export_rows_per_second": round(args.entries / export_seconds),
+                "export_peak_mb": round(export_peak / 2 ** 20, 2),
+                "import_rows_per_second": round(args.entries / import_seconds),
+                "import_peak_mb": round(import_peak / 2 ** 20, 2),
+            }
+        storage.close_connections()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Insert throughput of storage.save_entry against the write-behind ingest queue.
+
+Each scenario writes N entries (5000 by default) from T concurrent threads into
+a fresh scratch database: one transaction per entry through save_entry, then
+ingest.IngestQueue in "commit" mode (callers wait for the group commit) and
+"enqueue" mode (callers return once queued; timed until flush completes).
+
+    python bench/bench_ingest.py --entries 5000 --threads 8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from ingest import IngestQueue
+
+EMOTIONS = ["happy", "sad", "angry", "anxious", "excited", "calm", "tired", "content"]
+
+
+def make_entries(count, seed=11):
+    rng = random.Random(seed)
+    return [
+        (rng.choice(EMOTIONS), "How are you feeling today?",
+         "Bench entry %d with a few words of text." % i,
+         rng.randint(-100, 100), rng.randint(-100, 100))
+        for i in range(count)
+    ]
+
+
+def run(db_file, entries, threads, write, finish=None):
+    storage.create_db(db_file)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda entry: write(*entry), entries))
+    if finish is not None:
+        finish()
+    elapsed = time.perf_counter() - started
+
+    count = storage.connect(db_file).execute("SELECT COUNT(*) FROM journal_entries").fetchone()[0]
+    assert count == len(entries), (count, len(entries))
+    return {"seconds": round(elapsed, 3), "inserts_per_second": round(len(entries) / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    entries = make_entries(args.entries)
+    results = {"entries": args.entries, "threads": args.threads}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "save_entry.db")
+        results["save_entry"] = run(
+            db_file, entries, args.threads,
+            lambda *entry: storage.save_entry(*entry, db_file=db_file),
+        )
+
+        for durability in ("commit", "enqueue"):
+            db_file = os.path.join(tmp, f"queue_{durability}.db")
+            ingest = IngestQueue(db_file=db_file, durability=durability)
+            results[f"queue_{durability}"] = run(
+                db_file, entries, args.threads, ingest.submit, ingest.shutdown,
+            )
+            results[f"queue_{durability}"]["batches"] = ingest.stats()["batches"]
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
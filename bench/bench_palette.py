@@ -0,0 +1,88 @@
+"""
+Render-time micro-benchmark for the entry list colour dots.
+
+Renders the entry card markup for N entries (10k by default) two ways: calling
+get_color_from_coordinates from Jinja once per entry, and annotating the result
+set with palette.annotate_entries before rendering a template that only reads
+entry.color.
+
+    python bench/bench_palette.py --entries 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment
+
+from palette import annotate_entries, get_color_from_coordinates
+
+PER_ENTRY_CALL = '''{% for entry in entries %}
+<div class="card"><span class="badge">{{ entry.emotion }}</span>
+{% if entry.x_coordinate is not none and entry.y_coordinate is not none %}
+<div class="emotion-dot" style="background-color: {{ get_color_from_coordinates(entry.x_coordinate, entry.y_coordinate) }}"></div>
+{% endif %}</div>
+{% endfor %}'''
+
+PRECOMPUTED = '''{% for entry in entries %}
+<div class="card"><span class="badge">{{ entry.emotion }}</span>
+{% if entry.color %}
+<div class="emotion-dot" style="background-color: {{ entry.color }}"></div>
+{% endif %}</div>
+{% endfor %}'''
+
+
+def make_entries(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            'emotion': 'calm',
+            'x_coordinate': rng.randint(-100, 100),
+            'y_coordinate': rng.randint(-100, 100),
+        }
+        for _ in range(count)
+    ]
+
+
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    env = Environment(autoescape=True)
+    per_entry = env.from_string(PER_ENTRY_CALL)
+    precomputed = env.from_string(PRECOMPUTED)
+
+    def render_per_entry():
+        entries = make_entries(args.entries)
+        return per_entry.render(entries=entries, get_color_from_coordinates=get_color_from_coordinates)
+
+    def render_precomputed():
+        entries = annotate_entries(make_entries(args.entries))
+        return precomputed.render(entries=entries)
+
+    baseline = best_of(args.repeat, lambda: make_entries(args.entries))
+    results = {
+        "entries": args.entries,
+        "per_entry_call_ms": round((best_of(args.repeat, render_per_entry) - baseline) * 1000, 2),
+        "precomputed_palette_ms": round((best_of(args.repeat, render_precomputed) - baseline) * 1000, 2),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Full-text search benchmark on a synthetic journal.
+
+Fills a scratch database with N entries from generate.py (100k by default),
+then times a set of queries through search.search_entries (FTS5 + bm25)
+against the naive approach of loading every entry and filtering in Python.
+
+    python bench/bench_search.py --entries 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from search import search_entries
+from generate import fill_journal
+
+QUERIES = ["river", "coffee morning", "deadline stress", "grat*", "ocean letter memory"]
+
+
+def naive_search(db_file, query):
+    words = [word.rstrip('*').lower() for word in query.split()]
+    rows = storage.get_connection(db_file).execute(
+        "SELECT id, prompt, response FROM journal_entries"
+    ).fetchall()
+    return [
+        row["id"] for row in rows
+        if all(word in (row["prompt"] + " " + row["response"]).lower() for word in words)
+    ]
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {"entries": args.entries, "queries": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "search.db")
+        results["fill_seconds"] = round(fill_journal(db_file, args.entries), 2)
+
+        for query in QUERIES:
+            fts_time, hits = timed(lambda: search_entries(query, db_file=db_file), args.repeat)
+            naive_time, matches = timed(lambda: naive_search(db_file, query), args.repeat)
+            results["queries"][query] = {
+                "fts_ms": round(fts_time * 1000, 2),
+                "python_scan_ms": round(naive_time * 1000, 2),
+                "top_hits": len(hits),
+                "total_matches_naive": len(matches),
+            }
+        storage.close_connections()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Write throughput with one shared journal file against one file per user.
+
+U users (8 by default) each save K entries (500 by default) from their own
+thread with storage.save_entry: first all into a single database, then each
+into the database shards.ShardRouter gives that user.
+
+    python bench/bench_shards.py --users 8 --entries 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from shards import ShardRouter
+
+
+def run(users, entries, db_for):
+    def write(user):
+        db_file = db_for(user)
+        for i in range(entries):
+            storage.save_entry("calm", "How was today?", f"{user} entry {i}", 10, 20, db_file=db_file)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        list(pool.map(write, users))
+    elapsed = time.perf_counter() - started
+    return {"seconds": round(elapsed, 3), "inserts_per_second": round(len(users) * entries / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--entries", type=int, default=500)
+    args = parser.parse_args()
+
+    users = [f"user{i}" for i in range(args.users)]
+    results = {"users": args.users, "entries_per_user": args.entries}
+    with tempfile.TemporaryDirectory() as tmp:
+        shared = os.path.join(tmp, "shared.db")
+        storage.create_db(shared)
+        results["single_file"] = run(users, args.entries, lambda user: shared)
+
+        router = ShardRouter(shard_dir=os.path.join(tmp, "journals"), default_db=shared)
+        for user in users:
+            router.db_for(user)
+        results["per_user_shards"] = run(users, args.entries, router.db_for)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
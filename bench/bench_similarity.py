@@ -0,0 +1,139 @@
+"""
+Similarity index benchmark on a synthetic journal.
+
+Fills a scratch database with N entries from generate.py (100k by default),
+then times:
+- the first prompt repeat check on the never-indexed journal, and the
+  background backfill it starts
+- the full index build
+- incremental syncs of single new entries
+- related-entry queries on random entries
+- prompt repeat checks
+
+Related queries are compared with scoring every entry from the database
+without an index. Reports the vectors file size as well.
+
+    python bench/bench_similarity.py --entries 100000 --queries 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+import similarity
+from generate import fill_journal
+
+
+def unindexed_related(db_file, entry_id, limit):
+    """Related entries the way it would be done without an index: vectorize everything per query"""
+    rows = storage.get_connection(db_file).execute(
+        "SELECT id, prompt, response FROM journal_entries ORDER BY id"
+    ).fetchall()
+    texts = [f"{row['prompt']}\n{row['response']}" for row in rows]
+    tf = similarity.term_frequencies(texts)
+    idf = np.log((1 + len(rows)) / (1 + np.count_nonzero(tf, axis=0))) + 1
+    vectors = similarity.normalize(tf * idf)
+    ids = np.array([row["id"] for row in rows])
+    at = int(np.searchsorted(ids, entry_id))
+    scores = vectors @ vectors[at]
+    scores[at] = -1.0
+    return ids[np.argsort(scores)[::-1][:limit]].tolist()
+
+
+def latency_summary(samples):
+    samples = sorted(samples)
+    pick = lambda fraction: samples[min(len(samples) - 1, int(fraction * len(samples)))]
+    return {
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def timed_each(fn, items):
+    samples = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200, help="related and prompt queries to time")
+    parser.add_argument("--syncs", type=int, default=200, help="single-entry incremental syncs to time")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = {"entries": args.entries}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "similarity.db")
+        results["fill_seconds"] = round(fill_journal(db_file, args.entries, seed=args.seed), 2)
+        index = similarity.index_for(db_file)
+
+        # As on the first /get_prompt after deploying onto an existing journal
+        started = time.perf_counter()
+        similarity.prompt_filter(db_file)
+        cold = time.perf_counter() - started
+        while index._backfilling:
+            time.sleep(0.05)
+        results["cold_start"] = {
+            "first_filter_ms": round(cold * 1000, 1),
+            "backfill_seconds": round(time.perf_counter() - started, 2),
+        }
+
+        started = time.perf_counter()
+        index.rebuild()
+        build = time.perf_counter() - started
+        results["build"] = {
+            "seconds": round(build, 2),
+            "entries_per_s": round(args.entries / build),
+            "file_mb": round(os.path.getsize(index.path) / 2 ** 20, 1),
+        }
+
+        def add_and_sync(i):
+            storage.save_entry("Calm", "What helped you slow down today?",
+                               f"A quiet walk by the river, entry {i}.", db_file=db_file)
+            index.sync()
+
+        # save_entry's own commit is included; the sync is the difference to a plain save
+        saves = timed_each(lambda i: storage.save_entry("Calm", "Prompt", "Response", db_file=db_file),
+                           range(args.syncs))
+        index.sync()
+        synced = timed_each(add_and_sync, range(args.syncs))
+        results["incremental"] = {
+            "save_only": latency_summary(saves),
+            "save_and_sync": latency_summary(synced),
+        }
+
+        ids = [rng.randint(1, args.entries) for _ in range(args.queries)]
+        results["related"] = latency_summary(
+            timed_each(lambda entry_id: similarity.related_entries(entry_id, db_file=db_file), ids)
+        )
+        started = time.perf_counter()
+        unindexed_related(db_file, ids[0], similarity.RELATED_LIMIT)
+        results["related"]["unindexed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        prompts = [f"What made you feel calm about {word} today?" for word in ("river", "work", "music", "rain")]
+        results["prompt_check"] = {
+            "filter": latency_summary(timed_each(lambda _: similarity.prompt_filter(db_file), range(args.queries))),
+            "check": latency_summary(timed_each(similarity.prompt_filter(db_file), prompts * (args.queries // 4))),
+        }
+        storage.close_connections()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Concurrency benchmark for the journal store.
+
+Runs W writer threads calling save_entry and R reader threads running the
+dashboard range query against a scratch database for a fixed duration, once
+with the legacy connect-per-call / rollback-journal code and once with
+storage.py (per-thread connections, WAL, tuned pragmas). Reports throughput
+and "database is locked" errors for each.
+
+    python bench/bench_storage.py --writers 8 --readers 8 --seconds 5
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+
+
+def legacy_create_db(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS journal_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        emotion TEXT NOT NULL,
+        prompt TEXT NOT NULL,
+        response TEXT NOT NULL,
+        x_coordinate INTEGER,
+        y_coordinate INTEGER
+    )
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def legacy_save_entry(db_file, emotion, prompt, response, x, y):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn = sqlite3.connect(db_file)
+    conn.execute('''
+    INSERT INTO journal_entries (timestamp, emotion, prompt, response, x_coordinate, y_coordinate)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (timestamp, emotion, prompt, response, x, y))
+    conn.commit()
+    conn.close()
+
+
+def legacy_read(db_file, start_str, end_str):
+    conn = sqlite3.connect(db_file)
+    rows = conn.execute('''
+    SELECT emotion, COUNT(*) FROM journal_entries
+    WHERE timestamp BETWEEN ? AND ? GROUP BY emotion
+    ''', (start_str, end_str)).fetchall()
+    conn.close()
+    return rows
+
+
+def pooled_save_entry(db_file, emotion, prompt, response, x, y):
+    storage.save_entry(emotion, prompt, response, x, y, db_file=db_file)
+
+
+def pooled_read(db_file, start_str, end_str):
+    return storage.get_connection(db_file).execute('''
+    SELECT emotion, COUNT(*) FROM journal_entries
+    WHERE timestamp BETWEEN ? AND ? GROUP BY emotion
+    ''', (start_str, end_str)).fetchall()
+
+
+def run(save, read, db_file, writers, readers, seconds):
+    stop = threading.Event()
+    counts = {"writes": 0, "reads": 0, "locked": 0, "errors": 0}
+    lock = threading.Lock()
+    end = datetime.now() + timedelta(days=1)
+    window = ((end - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S"))
+
+    def worker(kind):
+        while not stop.is_set():
+            try:
+                if kind == "writes":
+                    save(db_file, "calm", "A benchmark prompt", "A benchmark response " * 10, 10, -20)
+                else:
+                    read(db_file, *window)
+                outcome = kind
+            except sqlite3.OperationalError as e:
+                outcome = "locked" if "locked" in str(e) else "errors"
+            with lock:
+                counts[outcome] += 1
+        storage.close_connections()
+
+    threads = [threading.Thread(target=worker, args=("writes",)) for _ in range(writers)]
+    threads += [threading.Thread(target=worker, args=("reads",)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "writes_per_sec": round(counts["writes"] / seconds, 1),
+        "reads_per_sec": round(counts["reads"] / seconds, 1),
+        "locked_errors": counts["locked"],
+        "other_errors": counts["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, "legacy.db")
+        legacy_create_db(legacy_db)
+        results["legacy"] = run(legacy_save_entry, legacy_read, legacy_db,
+                                args.writers, args.readers, args.seconds)
+
+        pooled_db = os.path.join(tmp, "pooled.db")
+        storage.create_db(pooled_db)
+        results["storage"] = run(pooled_save_entry, pooled_read, pooled_db,
+                                 args.writers, args.readers, args.seconds)
+        storage.close_connections()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
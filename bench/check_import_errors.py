@@ -0,0 +1,60 @@
+"""
+Check that malformed import files stop with ImportFailed, not a crash.
+
+Imports a few broken JSONL and CSV files into scratch journals and expects
+each to raise journal_io.ImportFailed (which main.py turns into a message
+with the failing record and a --skip hint) with the right resume point.
+Exits non-zero if any file raises something else or imports silently.
+
+    python bench/check_import_errors.py
+"""
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from journal_io import import_entries, ImportFailed
+
+GOOD_JSONL = '{"emotion": "calm", "prompt": "P", "response": "R"}\n'
+
+# (name, format, file contents, expected resume_at)
+CASES = [
+    ("jsonl array line", "jsonl", GOOD_JSONL + "[1, 2]\n", 1),
+    ("jsonl string line", "jsonl", GOOD_JSONL + '"x"\n', 1),
+    ("jsonl invalid json", "jsonl", GOOD_JSONL + "{oops\n", 1),
+    ("csv unterminated quote", "csv",
+     'emotion,prompt,response\ncalm,P,R\ncalm,"P\n', 1),
+    # Longer than csv.field_size_limit(), so the reader raises csv.Error
+    ("csv oversized field", "csv", f"emotion,prompt,response\ncalm,P,R\ncalm,P,{'x' * 200000}\n", 1),
+]
+
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (name, fmt, text, resume_at) in enumerate(CASES):
+            db_file = os.path.join(tmp, f"import{i}.db")
+            storage.create_db(db_file)
+            try:
+                # Batches of one, so records before the bad one are committed
+                import_entries(io.StringIO(text, newline=""), fmt, db_file, batch_size=1)
+                outcome = "imported without an error"
+            except ImportFailed as e:
+                outcome = None if e.resume_at == resume_at else f"resume_at {e.resume_at}, expected {resume_at}"
+                detail = str(e)
+            except Exception as e:
+                outcome = f"raised {type(e).__name__}: {e}"
+
+            status = "ok" if outcome is None else "FAIL"
+            failures += status != "ok"
+            print(f"[{status}] {name}: {detail if outcome is None else outcome}")
+        storage.close_connections()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Import-time budget check for the CLI and web entry points.
+
+Imports main.py and app.py in fresh interpreters under `python -X importtime`
+(best of N runs, from a scratch working directory). Exits non-zero if either
+takes longer than its budget, or pulls in a module that is only supposed to
+load on first use, such as the HTTP stack for main.py or numpy for app.py.
+Also checks that the modules main.py defers still see the API key from a
+.env file once the interactive session imports them.
+
+    python bench/check_import_time.py --runs 5
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time allowed per entry point, in milliseconds
+BUDGETS_MS = {"main": 60, "app": 300}
+
+# Modules each entry point must not import eagerly
+DEFERRED = {
+    "main": ["requests", "httpx", "numpy", "flask", "asyncio", "dotenv"],
+    "app": ["requests", "httpx", "numpy"],
+}
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def measure(module, cwd):
+    """
+    Import module once in a fresh interpreter.
+
+    Returns:
+        tuple: (cumulative milliseconds, set of imported module names)
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    total_us = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        imported.add(match.group(4).split(".")[0])
+        if match.group(4) == module and not match.group(3):
+            total_us = int(match.group(2))
+    return total_us / 1000, imported
+
+
+def check_dotenv(cwd):
+    """
+    Run main.py's deferred prompt import with the API key only in ./.env.
+
+    Returns:
+        str: The API key prompt_gen ended up with
+    """
+    with open(os.path.join(cwd, ".env"), "w") as f:
+        f.write("OPENROUTER_API_KEY=from-dotenv\n")
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    env.pop("OPENROUTER_API_KEY", None)
+    try:
+        result = subprocess.run(
+            # The same import journal_session makes after an emotion is picked
+            [sys.executable, "-c", "import main\nfrom prompt_gen import OPENROUTER_API_KEY\nprint(OPENROUTER_API_KEY)"],
+            cwd=cwd, env=env, capture_output=True, text=True
+        )
+    finally:
+        os.remove(os.path.join(cwd, ".env"))
+    if result.returncode != 0:
+        raise RuntimeError(f"interactive import failed:\n{result.stderr}")
+    return result.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--main-budget-ms", type=float, default=BUDGETS_MS["main"])
+    parser.add_argument("--app-budget-ms", type=float, default=BUDGETS_MS["app"])
+    args = parser.parse_args()
+    budgets = {"main": args.main_budget_ms, "app": args.app_budget_ms}
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for module, budget in budgets.items():
+            runs = [measure(module, tmp) for _ in range(args.runs)]
+            best = min(ms for ms, _ in runs)
+            eager = [name for name in DEFERRED[module] if name in runs[0][1]]
+
+            status = "ok" if best <= budget and not eager else "FAIL"
+            failures += status != "ok"
+            print(f"[{status}] import {module}: {best:.1f} ms (budget {budget:.0f} ms)")
+            for name in eager:
+                print(f"    imports {name} eagerly")
+
+        key = check_dotenv(tmp)
+        status = "ok" if key == "from-dotenv" else "FAIL"
+        failures += status != "ok"
+        print(f"[{status}] API key from .env after main.py's deferred imports: {key}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
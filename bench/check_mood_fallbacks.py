@@ -0,0 +1,81 @@
+"""
+Check that lexicon fallbacks for coordinate moods are never cached.
+
+Against bench/fake_openrouter.py, with the shared circuit breaker forced open,
+resolves a cell no lexicon word is close to. The answer must come from the
+lexicon without an upstream call and without being stored in the in-process
+cache or mood_cache.db. Once the breaker closes again, the same cell must go
+to the LLM. Exits non-zero if any of that fails.
+
+    python bench/check_mood_fallbacks.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from fake_openrouter import start_server
+
+# Further than LEXICON_RADIUS from every lexicon word, so only the LLM can answer
+X, Y = -100, -100
+
+
+def cached_rows(cache_file):
+    if not os.path.exists(cache_file):
+        return []
+    conn = sqlite3.connect(cache_file)
+    try:
+        return conn.execute("SELECT qx, qy, mood FROM mood_cache").fetchall()
+    finally:
+        conn.close()
+
+
+def main():
+    server, url = start_server(0, 0)
+    os.environ["OPENROUTER_API_URL"] = url
+    os.environ.setdefault("OPENROUTER_API_KEY", "bench-key")
+
+    failures = 0
+
+    def report(ok, message):
+        nonlocal failures
+        failures += not ok
+        print(f"[{'ok' if ok else 'FAIL'}] {message}")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # mood_cache.db lives in the working directory
+        os.chdir(tmp)
+        try:
+            from llm_client import get_client
+            from mood_picker import MoodCoordinateMapper
+            from mood_resolver import default_resolver
+
+            mapper = MoodCoordinateMapper()
+            breaker = get_client().breaker
+            for _ in range(breaker.failure_threshold):
+                breaker.record_failure()
+
+            mood = mapper.get_mood_from_coordinates(X, Y)
+            report(mood == default_resolver.nearest_lexicon_mood(X, Y) and not server.payloads,
+                   f"breaker open: ({X}, {Y}) -> {mood!r} from the lexicon, {len(server.payloads)} upstream calls")
+            report(default_resolver.lookup(X, Y) is None and not cached_rows(default_resolver.cache_file),
+                   "breaker open: the fallback was not cached")
+
+            breaker.record_success()
+            mood = mapper.get_mood_from_coordinates(X, Y)
+            report(len(server.payloads) == 1,
+                   f"breaker closed: ({X}, {Y}) -> {mood!r}, {len(server.payloads)} upstream calls")
+        finally:
+            os.chdir(cwd)
+            server.shutdown()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Query-plan check for the dashboard's journal_entries queries.
+
+Seeds a scratch journal, records every SQL statement the Flask routes execute
+(via sqlite3's trace callback), and runs EXPLAIN QUERY PLAN on each SELECT.
+Exits non-zero if any page request fails, if no dashboard GROUP BY query on
+journal_entries was recorded, or if any SELECT falls back to a full scan of
+journal_entries.
+
+    python bench/check_query_plans.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+FULL_SCAN = re.compile(r"^SCAN journal_entries\b(?!.*USING)")
+
+PAGES = ["/?time_period=week", "/?time_period=month", "/?time_period=year", "/?time_period=all"]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        # app.py creates journal.db relative to the working directory on import
+        os.chdir(tmp)
+        import app
+        import storage
+
+        for i in range(50):
+            storage.save_entry("calm", f"Prompt {i}", f"Response {i}", i, -i)
+
+        statements = []
+        conn = storage.get_connection()
+        conn.set_trace_callback(statements.append)
+        client = app.app.test_client()
+        failures = 0
+        for page in PAGES:
+            status_code = client.get(page).status_code
+            if status_code != 200:
+                failures += 1
+                print(f"[FAIL] GET {page} returned {status_code}")
+        conn.set_trace_callback(None)
+
+        # The grouped chart query is the one the plans matter most for
+        if not any("GROUP BY" in sql.upper() and "journal_entries" in sql for sql in statements):
+            failures += 1
+            print("[FAIL] no dashboard GROUP BY query on journal_entries was recorded")
+
+        for sql in dict.fromkeys(statements):
+            if not sql.lstrip().upper().startswith("SELECT") or "journal_entries" not in sql:
+                continue
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            scans = [detail for detail in plan if FULL_SCAN.match(detail)]
+            status = "FULL SCAN" if scans else "ok"
+            failures += bool(scans)
+            print(f"[{status}] {' '.join(sql.split())}")
+            for detail in plan:
+                print(f"    {detail}")
+
+        storage.close_connections()
+        os.chdir(REPO_ROOT)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
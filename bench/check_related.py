@@ -0,0 +1,72 @@
+"""
+Check that related entries exclude unrelated ones.
+
+Fills a scratch journal with N entries of random vocabulary, plus pairs that
+share a third of their words, and asks for each pair's related entries.
+Exits non-zero unless every pair finds its partner first and nothing else:
+random entries share no topic, so anything else listed is hash-collision
+noise above MIN_RELATED_SCORE.
+
+    python bench/check_related.py --entries 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+import similarity
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--pairs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Made-up words and numbers, so entries only overlap by chance
+    vocabulary = [f"w{rng.randrange(10 ** 6)}" for _ in range(20000)] + [str(rng.randrange(10000)) for _ in range(5000)]
+    words = lambda n: [rng.choice(vocabulary) for _ in range(n)]
+
+    rows = [storage.entry_row("Calm", " ".join(words(8)), " ".join(words(40))) for _ in range(args.entries)]
+    pairs = []
+    for _ in range(args.pairs):
+        first = words(40)
+        second = rng.sample(first, 14) + words(26)
+        rows.append(storage.entry_row("Calm", " ".join(words(8)), " ".join(first)))
+        rows.append(storage.entry_row("Calm", " ".join(words(8)), " ".join(second)))
+        pairs.append((len(rows) - 1, len(rows)))
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "related.db")
+        storage.create_db(db_file)
+        storage.save_entries(rows, db_file)
+        similarity.sync_index(db_file)
+
+        noise = 0
+        for first, second in pairs:
+            related = [(entry["id"], entry["score"]) for entry in similarity.related_entries(first, db_file=db_file)]
+            if not related or related[0][0] != second:
+                failures += 1
+                print(f"[FAIL] entry {first}: partner {second} not ranked first: {related}")
+            unrelated = [match for match in related if match[0] != second]
+            if unrelated:
+                failures += 1
+                noise += len(unrelated)
+                print(f"[FAIL] entry {first}: unrelated entries listed: {unrelated}")
+
+        print(f"[{'ok' if not failures else 'FAIL'}] {len(pairs)} pairs among {args.entries} random entries, "
+              f"{noise} unrelated entries listed (DIM {similarity.DIM}, min score {similarity.MIN_RELATED_SCORE})")
+        storage.close_connections()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Concurrency check for the ASGI entry point.
+
+Opens C concurrent /get_prompt/stream requests against bench/fake_openrouter.py
+(with the prompt pool cold, so every request streams from the LLM) twice:
+through asgi.app, which serves the route natively, and through asgi.wsgi_app,
+the Flask fallback every other route takes. Exits non-zero if the slowest
+request of either path takes more than --max-ratio times the fake upstream's
+time for a single stream, i.e. if concurrent requests are being queued
+behind each other instead of running side by side.
+
+    python bench/check_stream_concurrency.py --concurrency 8 --latency-ms 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from fake_openrouter import start_server
+
+
+async def stream(asgi_app, emotion):
+    """
+    Read one /get_prompt/stream response to the end.
+
+    Returns:
+        tuple: (seconds, status, whether a "done" event arrived)
+    """
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/get_prompt/stream", "root_path": "", "headers": [],
+        "query_string": f"emotion={emotion}".encode("ascii"),
+    }
+    requests = [{"type": "http.request", "body": b""}]
+    finished = asyncio.Event()
+    messages = []
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    started = time.perf_counter()
+    await asgi_app(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    finished.set()
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return elapsed, messages[0]["status"], b"event: done" in body
+
+
+async def check(asgi_module, concurrency, max_ratio):
+    """
+    Time one stream, then `concurrency` at once through each path.
+
+    Returns:
+        int: Number of paths that failed the check
+    """
+    failures = 0
+    single, _, _ = await stream(asgi_module.app, "calm")
+    budget = single * max_ratio
+    for name, asgi_app in (("native", asgi_module.app), ("wsgi fallback", asgi_module.wsgi_app)):
+        # Distinct emotions so no request can be answered from another's pooled prompt
+        results = await asyncio.gather(*(
+            stream(asgi_app, f"{name.split()[0]}{i}") for i in range(concurrency)
+        ))
+        slowest = max(elapsed for elapsed, _, _ in results)
+        broken = sum(status != 200 or not done for _, status, done in results)
+
+        status = "ok" if slowest <= budget and not broken else "FAIL"
+        failures += status != "ok"
+        print(f"[{status}] {name}: {concurrency} concurrent streams, slowest {slowest * 1000:.0f} ms "
+              f"(budget {budget * 1000:.0f} ms, one stream {single * 1000:.0f} ms)")
+        if broken:
+            print(f"    {broken} streams failed or ended without a done event")
+
+    await asgi_module.get_async_client().aclose()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=500, help="fake OpenRouter latency to the first token")
+    parser.add_argument("--token-ms", type=float, default=10, help="fake OpenRouter delay between streamed tokens")
+    parser.add_argument("--max-ratio", type=float, default=2.0,
+                        help="allowed slowest-request time as a multiple of one stream's time")
+    args = parser.parse_args()
+
+    server, url = start_server(args.latency_ms, 0, token_ms=args.token_ms)
+    os.environ["OPENROUTER_API_URL"] = url
+    os.environ.setdefault("OPENROUTER_API_KEY", "bench-key")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app keeps journal.db and mood_cache.db relative to the working directory
+        os.chdir(tmp)
+        try:
+            import asgi
+            failures = asyncio.run(check(asgi, args.concurrency, args.max_ratio))
+
+            import ingest
+            ingest.shutdown_queues()
+        finally:
+            os.chdir(cwd)
+            server.shutdown()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
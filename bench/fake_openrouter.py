@@ -0,0 +1,153 @@
+"""
+Local stand-in for the OpenRouter chat-completions API.
+
+Answers mood, batched-mood and journal-prompt requests in the shape the app
+expects, including a usage field. Requests with stream: true get server-sent
+events, one word per chunk. Latency (to the first token), per-token delay,
+jitter and failure rate are configurable, so benchmarks can run with no
+network. Failures answer 503, which the client treats as retryable. Point the
+app at it with OPENROUTER_API_URL.
+
+    python bench/fake_openrouter.py --port 8089 --latency-ms 300 --token-ms 20 --failure-rate 0.05
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mood_resolver import MOOD_LEXICON
+
+# Batched mood requests list "x=.., y=.." per point; single ones give "(value: ..)" twice
+POINT_PATTERN = re.compile(r"x=(-?[\d.]+), y=(-?[\d.]+)")
+VALUE_PATTERN = re.compile(r"\(value: (-?[\d.]+)")
+
+PROMPT_TEMPLATES = [
+    "Think of one moment today when you felt {emotion}; what led up to it and what did it change?",
+    "Write about where you notice being {emotion} in your body, and what it might be asking of you.",
+    "If feeling {emotion} were a letter to your future self, what would it say about this week?",
+    "What is one small action that would honour feeling {emotion} rather than pushing it away?",
+]
+
+
+def nearest_mood(x, y):
+    return min(MOOD_LEXICON, key=lambda mood: (mood[1] - x) ** 2 + (mood[2] - y) ** 2)[0]
+
+
+def answer(payload):
+    """Completion text for a request built by mood_picker or prompt_gen."""
+    user = payload["messages"][-1]["content"]
+    points = [(float(x), float(y)) for x, y in POINT_PATTERN.findall(user)]
+    if "JSON array" in user:
+        return json.dumps([nearest_mood(x, y) for x, y in points])
+    values = [float(value) for value in VALUE_PATTERN.findall(user)]
+    if len(values) == 2:
+        return nearest_mood(*values)
+    emotion = re.search(r"feeling (\S+)", user)
+    return random.choice(PROMPT_TEMPLATES).format(emotion=emotion.group(1) if emotion else "this way")
+
+
+def make_handler(latency_ms, jitter_ms, failure_rate, token_ms=0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            self.server.payloads.append(payload)
+            time.sleep(max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000)
+
+            if random.random() < failure_rate:
+                self.send_json(503, {"error": {"message": "fake upstream failure"}})
+                return
+
+            content = answer(payload)
+            usage = {
+                "prompt_tokens": sum(len(m["content"].split()) for m in payload["messages"]),
+                "completion_tokens": len(content.split()),
+            }
+            if payload.get("stream"):
+                self.send_stream(content, usage)
+                return
+
+            self.send_json(200, {
+                "id": "fake-completion",
+                "model": payload.get("model"),
+                "choices": [{"message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            })
+
+        def send_stream(self, content, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            self.send_chunk(": OPENROUTER PROCESSING\n\n")
+            for i, word in enumerate(content.split(" ")):
+                if i:
+                    time.sleep(token_ms / 1000)
+                delta = {"choices": [{"delta": {"content": word if i == 0 else " " + word}}]}
+                self.send_chunk(f"data: {json.dumps(delta)}\n\n")
+            final = {"choices": [{"delta": {}, "finish_reason": "stop"}], "usage": usage}
+            self.send_chunk(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def send_chunk(self, text):
+            data = text.encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(latency_ms=200, jitter_ms=50, failure_rate=0.0, port=0, token_ms=15):
+    """
+    Serve the fake API on a background thread.
+
+    Returns:
+        tuple: (server, url) - call server.shutdown() when done
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency_ms, jitter_ms, failure_rate, token_ms))
+    server.daemon_threads = True
+    # Every request body received, for checks that count upstream calls
+    server.payloads = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--token-ms", type=float, default=15, help="delay between streamed tokens")
+    args = parser.parse_args()
+
+    server, url = start_server(args.latency_ms, args.jitter_ms, args.failure_rate, args.port, args.token_ms)
+    print(f"Fake OpenRouter listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Synthetic journal generator shared by the benchmarks.
+
+Fills journal_entries with entries that look like real use:
+- Timestamps cluster in the evening and spread over the chosen number of days.
+- Emotions follow a skewed distribution over the mood lexicon, with
+  coordinates scattered around each mood's lexicon point.
+- Response lengths are log-normal, with Zipf-distributed words.
+
+Rows go through storage.save_entries, so the rollup, data version and FTS
+index are maintained exactly as in production.
+
+    python bench/generate.py --size 100k --db /tmp/journal.db
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from mood_resolver import MOOD_LEXICON
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+# Real words used by the benchmark queries; always part of the vocabulary
+WORDS = (
+    "today work family friend walk river morning coffee tired meeting deadline "
+    "sleep dream music run garden rain sunlight dinner call mother brother "
+    "project laugh worry hope plan weekend book city train quiet noise "
+    "grateful proud lonely stress breathe forest ocean letter memory change"
+).split()
+
+# Relative likelihood of journaling at each hour of the day (evening peak)
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 6, 6, 4, 3, 3, 4, 3, 3, 3, 4, 5, 6, 8, 10, 10, 8, 4]
+
+# Share of entries written with the coordinate picker rather than a typed emotion
+COORDINATE_SHARE = 0.8
+
+INSERT_BATCH = 5000
+
+
+def parse_size(text):
+    """'1k', '100k', '1m' or a plain number of entries."""
+    return SIZES.get(text.lower()) or int(text)
+
+
+def vocabulary(rng, size=5000):
+    """Real words first, then filler words; Zipf weights so a few words dominate"""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    filler = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+    words = filler[:50] + WORDS + filler[50:]
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    return words, weights
+
+
+def generate_rows(entries, days=3 * 365, seed=42, now=None):
+    """
+    Yield entry_row tuples for a synthetic journal, oldest first.
+
+    The same seed always gives the same journal.
+    """
+    rng = random.Random(seed)
+    words, weights = vocabulary(rng)
+    moods = [name for name, _, _ in MOOD_LEXICON]
+    mood_weights = [1 / math.sqrt(rank) for rank in range(1, len(moods) + 1)]
+    rng.shuffle(mood_weights)
+    points = {name: (x, y) for name, x, y in MOOD_LEXICON}
+    start = (now or datetime.now()) - timedelta(days=days)
+
+    day_offsets = sorted(rng.randrange(days) for _ in range(entries))
+    for day in day_offsets:
+        when = start + timedelta(
+            days=day,
+            hours=rng.choices(range(24), HOUR_WEIGHTS)[0],
+            seconds=rng.randrange(3600),
+        )
+        emotion = rng.choices(moods, mood_weights)[0]
+        x = y = None
+        if rng.random() < COORDINATE_SHARE:
+            cx, cy = points[emotion]
+            x = max(-100, min(100, round(rng.gauss(cx, 8))))
+            y = max(-100, min(100, round(rng.gauss(cy, 8))))
+        length = max(5, min(600, int(rng.lognormvariate(4, 0.6))))
+        prompt = f"What made you feel {emotion.lower()} about " + " ".join(rng.sample(WORDS, 3)) + "?"
+        response = " ".join(rng.choices(words, weights, k=length))
+        yield storage.entry_row(emotion, prompt, response, x, y, when=when)
+
+
+def fill_journal(db_file, entries, days=3 * 365, seed=42):
+    """
+    Create db_file if needed and add a synthetic journal of the given size.
+
+    Returns:
+        float: Seconds spent generating and inserting
+    """
+    storage.create_db(db_file)
+    started = time.perf_counter()
+    batch = []
+    for row in generate_rows(entries, days, seed):
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH:
+            storage.save_entries(batch, db_file)
+            batch = []
+    storage.save_entries(batch, db_file)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", default="1k", help="1k, 100k, 1m or a number of entries")
+    parser.add_argument("--db", default=storage.DB_FILE, help="database to fill")
+    parser.add_argument("--days", type=int, default=3 * 365, help="span of the journal")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    entries = parse_size(args.size)
+    seconds = fill_journal(args.db, entries, args.days, args.seed)
+    print(f"Added {entries} entries to {args.db} in {seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+End-to-end latency scenarios for the Flask app against a local fake OpenRouter.
+
+Builds a scratch journal with bench/generate.py and starts
+bench/fake_openrouter.py. It then drives /, /get_emotion, /get_prompt,
+/get_prompt/stream and /save_entry through Flask test clients from C
+concurrent threads. For each scenario it reports p50/p90/p99 latency and
+throughput, and writes the results as JSON. For the stream scenario latency is
+the time to the first event, which is what the user waits for. "home" renders
+every page, with the rendered-page cache turned off, so it tracks dashboard
+queries and templating; "home_cached" is the same traffic with the cache on.
+Everything runs in a temporary directory; no network is used.
+
+    python bench/run_scenarios.py --size 100k --requests 500 --concurrency 8 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from fake_openrouter import start_server
+from generate import fill_journal, parse_size
+from mood_resolver import MOOD_LEXICON
+
+SCENARIOS = ["home", "home_cached", "get_emotion", "get_prompt", "get_prompt_stream", "save_entry"]
+PERIODS = ["week", "month", "year", "all"]
+MOODS = [name for name, _, _ in MOOD_LEXICON]
+
+
+def scenario_request(name, client, rng):
+    """Send one request for the scenario; returns the response."""
+    if name in ("home", "home_cached"):
+        return client.get(f"/?time_period={rng.choice(PERIODS)}")
+    if name == "get_emotion":
+        coordinates = {"x": rng.randint(-100, 100), "y": rng.randint(-100, 100)}
+        return client.post("/get_emotion", json={"coordinates": coordinates})
+    if name == "get_prompt":
+        return client.post("/get_prompt", json={"emotion": rng.choice(MOODS)})
+    if name == "get_prompt_stream":
+        response = client.get(f"/get_prompt/stream?emotion={rng.choice(MOODS)}", buffered=False)
+        next(response.iter_encoded(), None)
+        response.close()
+        return response
+    if name == "save_entry":
+        return client.post("/save_entry", json={
+            "emotion": rng.choice(MOODS),
+            "prompt": "How did today feel?",
+            "response": "A benchmark entry about the river walk and morning coffee.",
+            "coordinates": {"x": rng.randint(-100, 100), "y": rng.randint(-100, 100)},
+        })
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+@contextmanager
+def without_page_cache():
+    """Make every request render its page: the rendered-body cache keeps nothing."""
+    from http_cache import response_cache
+    max_size = response_cache.max_size
+    response_cache.max_size = 0
+    try:
+        yield
+    finally:
+        response_cache.max_size = max_size
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(flask_app, name, requests, concurrency, seed):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i):
+        nonlocal errors
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = flask_app.test_client()
+        rng = random.Random(seed * 100003 + i)
+        started = time.perf_counter()
+        response = scenario_request(name, client, rng)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    to_ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p90_ms": to_ms(percentile(latencies, 0.90)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+        "max_ms": to_ms(latencies[-1]),
+        "mean_ms": to_ms(sum(latencies) / len(latencies)),
+        "throughput_rps": round(requests / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", default="1k", help="journal size: 1k, 100k, 1m or a number")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=200, help="fake OpenRouter mean latency")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--token-ms", type=float, default=15, help="fake OpenRouter delay between streamed tokens")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON results file (default: print only)")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    server, url = start_server(args.latency_ms, args.jitter_ms, args.failure_rate, token_ms=args.token_ms)
+    os.environ["OPENROUTER_API_URL"] = url
+    os.environ.setdefault("OPENROUTER_API_KEY", "bench-key")
+
+    results = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "scenarios": {},
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app keeps journal.db, mood_cache.db and profiles relative to the working directory
+        os.chdir(tmp)
+        try:
+            results["fill_seconds"] = round(fill_journal("journal.db", parse_size(args.size), seed=args.seed), 2)
+
+            import app
+            for name in args.scenarios:
+                with without_page_cache() if name == "home" else nullcontext():
+                    results["scenarios"][name] = run_scenario(
+                        app.app, name, args.requests, args.concurrency, args.seed
+                    )
+
+            import ingest
+            ingest.shutdown_queues()
+            import storage
+            storage.close_connections()
+        finally:
+            os.chdir(cwd)
+            server.shutdown()
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta
+
+from storage import DB_FILE, get_connection, to_epoch
+
+# Days covered by each dashboard period; anything else means all time
+PERIOD_DAYS = {
+    'week': 7,
+    'month': 30,
+    'year': 365,
+}
+
+# Timeline bucket size per period, chosen so the series stays a few hundred points at most
+PERIOD_BUCKETS = {
+    'week': 'day',
+    'month': 'day',
+    'year': 'week',
+    'all': 'month',
+}
+
+# Entry list page size and how much of each response the list view carries
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+PREVIEW_CHARS = 280
+MAX_ROWID = 2 ** 63 - 1
+
+# SQLite expressions mapping ts_epoch to the bucket's start date (weeks start on Monday)
+BUCKET_EXPRESSIONS = {
+    'day': "date(ts_epoch, 'unixepoch')",
+    'week': "date(ts_epoch, 'unixepoch', 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', ts_epoch, 'unixepoch')",
+}
+
+# Short periods group raw entries; year and all time read the per-day rollup table
+RAW_PERIODS = {'week', 'month'}
+ROLLUP_BUCKET_EXPRESSIONS = {
+    'day': "day",
+    'week': "date(day, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', day)",
+}
+
+
+def get_time_range(time_period='week', now=None):
+    """Return the (start, end) ts_epoch bounds for a dashboard time period"""
+    end_date = now or datetime.now()
+
+    if time_period in PERIOD_DAYS:
+        start_ts = to_epoch(end_date - timedelta(days=PERIOD_DAYS[time_period]))
+    else:  # all time
+        start_ts = 0
+
+    return start_ts, to_epoch(end_date)
+
+
+def encode_cursor(row):
+    """Keyset cursor pointing just past the given entry row"""
+    return f"{row['ts_epoch']}:{row['id']}"
+
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or out of SQLite's integer range
+    """
+    ts_epoch, entry_id = (int(part) for part in cursor.split(':'))
+    if not (-MAX_ROWID - 1 <= ts_epoch <= MAX_ROWID and 0 <= entry_id <= MAX_ROWID):
+        raise ValueError(f"Cursor out of range: {cursor!r}")
+    return ts_epoch, entry_id
+
+
+def list_entries(time_period='week', cursor=None, limit=PAGE_SIZE, db_file=DB_FILE):
+    """
+    Get one page of entry summaries, newest first.
+
+    Pages are addressed by a (ts_epoch, id) keyset cursor, so each page is an
+    index range scan no matter how deep into the journal it is. Responses are cut
+    to PREVIEW_CHARS; use get_entry for the full text.
+
+    Returns:
+        dict: {'entries': [...], 'next_cursor': str or None}
+    """
+    start_ts, end_ts = get_time_range(time_period)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if cursor:
+        before_ts, before_id = decode_cursor(cursor)
+    else:
+        # First page: everything up to now, whatever the id
+        before_ts, before_id = end_ts, MAX_ROWID
+
+    rows = get_connection(db_file).execute('''
+    SELECT id, ts_epoch, timestamp, emotion, prompt,
+           substr(response, 1, ?) AS preview,
+           length(response) > ? AS truncated,
+           x_coordinate, y_coordinate
+    FROM journal_entries
+    WHERE ts_epoch >= ? AND (ts_epoch, id) < (?, ?)
+    ORDER BY ts_epoch DESC, id DESC
+    LIMIT ?
+    ''', (PREVIEW_CHARS, PREVIEW_CHARS, start_ts, before_ts, before_id, limit + 1)).fetchall()
+
+    entries = [dict(row, truncated=bool(row['truncated'])) for row in rows[:limit]]
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+
+    return {
+        'entries': entries,
+        'next_cursor': next_cursor
+    }
+
+
+def get_entry(entry_id, db_file=DB_FILE):
+    """Get a single entry with its full response, or None if it doesn't exist"""
+    row = get_connection(db_file).execute('''
+    SELECT id, timestamp, emotion, prompt, response, x_coordinate, y_coordinate
+    FROM journal_entries
+    WHERE id = ?
+    ''', (entry_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def get_emotion_data(time_period='week', db_file=DB_FILE):
+    """
+    Get emotion data for chart visualization.
+
+    Per-emotion counts and the bucketed timeline come from one GROUP BY; the
+    counts are summed from the buckets. Week and month group raw entries over the
+    covering (ts_epoch, emotion) index. Year and all time group mood_daily_rollup,
+    so they read at most one row per day and emotion and start on a day boundary.
+
+    Returns:
+        dict: {'emotions': [{emotion, count}], 'timeline': [{bucket, emotion, count}],
+               'bucket': 'day' | 'week' | 'month'}
+    """
+    start_ts, end_ts = get_time_range(time_period)
+    bucket = PERIOD_BUCKETS.get(time_period, 'month')
+
+    if time_period in RAW_PERIODS:
+        cursor = get_connection(db_file).execute(f'''
+        SELECT {BUCKET_EXPRESSIONS[bucket]} AS bucket, emotion, COUNT(*) AS count
+        FROM journal_entries
+        WHERE ts_epoch BETWEEN ? AND ?
+        GROUP BY bucket, emotion
+        ORDER BY bucket
+        ''', (start_ts, end_ts))
+    else:
+        cursor = get_connection(db_file).execute(f'''
+        SELECT {ROLLUP_BUCKET_EXPRESSIONS[bucket]} AS bucket, emotion, SUM(count) AS count
+        FROM mood_daily_rollup
+        WHERE day BETWEEN date(?, 'unixepoch') AND date(?, 'unixepoch')
+        GROUP BY bucket, emotion
+        ORDER BY bucket
+        ''', (start_ts, end_ts))
+
+    timeline = []
+    counts = {}
+    for row in cursor:
+        timeline.append({'bucket': row['bucket'], 'emotion': row['emotion'], 'count': row['count']})
+        counts[row['emotion']] = counts.get(row['emotion'], 0) + row['count']
+
+    emotions = [
+        {'emotion': emotion, 'count': count}
+        for emotion, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    ]
+
+    return {
+        'emotions': emotions,
+        'timeline': timeline,
+        'bucket': bucket
+    }
+
+
+def get_dashboard(time_period='week', db_file=DB_FILE):
+    """Everything the home page needs for one time period: the first page of entries and chart data"""
+    page = list_entries(time_period, db_file=db_file)
+    return {
+        'entries': page['entries'],
+        'next_cursor': page['next_cursor'],
+        'emotion_data': get_emotion_data(time_period, db_file),
+    }
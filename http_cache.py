@@ -0,0 +1,147 @@
+import glob
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import g, request, make_response
+
+from storage import DB_FILE, get_data_version
+from shards import USER_HEADER
+
+# Pages for bounded periods (week/month/year) change as old entries age out even
+# without writes, so their cache keys also roll over every WINDOW_SECONDS.
+WINDOW_SECONDS = 300
+UNBOUNDED_PERIODS = {'all'}
+
+# Rendered responses kept in memory, least recently used evicted first
+MAX_CACHED_RESPONSES = 128
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def deploy_id():
+    """
+    Identifier of the deployed code and templates, part of every ETag.
+
+    MOODJOURNAL_DEPLOY_ID (e.g. a release tag or commit) if set, otherwise a
+    hash of the app's modules and templates. Either way every worker process
+    and every restart of the same deploy agree, so a client's validators keep
+    matching whichever worker answers; only a new deploy invalidates them.
+    """
+    configured = os.getenv("MOODJOURNAL_DEPLOY_ID")
+    if configured:
+        return configured
+    digest = hashlib.blake2b(digest_size=8)
+    paths = glob.glob(os.path.join(APP_DIR, "*.py"))
+    paths += glob.glob(os.path.join(APP_DIR, "templates", "**", "*"), recursive=True)
+    for path in sorted(paths):
+        if os.path.isfile(path):
+            digest.update(os.path.relpath(path, APP_DIR).encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+DEPLOY_ID = deploy_id()
+
+
+class ResponseCache:
+    """
+    LRU of response bodies keyed by ETag.
+
+    ETags embed the journal file and its data version, so a body can never be
+    served for another user or a newer version; stale bodies simply age out.
+    """
+
+    def __init__(self, max_size=MAX_CACHED_RESPONSES):
+        self.max_size = max_size
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def get(self, etag):
+        with self._lock:
+            cached = self._bodies.get(etag)
+            if cached is not None:
+                self._bodies.move_to_end(etag)
+            self.counters["hits" if cached is not None else "misses"] += 1
+            return cached
+
+    def put(self, etag, cached):
+        with self._lock:
+            self._bodies[etag] = cached
+            while len(self._bodies) > self.max_size:
+                self._bodies.popitem(last=False)
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+
+response_cache = ResponseCache()
+
+
+def cache_validators():
+    """
+    ETag and Last-Modified for the current request's view of the data.
+
+    Returns:
+        tuple: (etag, last_modified datetime)
+    """
+    db_file = g.get('db_file', DB_FILE)
+    version, last_modified = get_data_version(db_file)
+    parts = [DEPLOY_ID, db_file, version, request.full_path]
+
+    if request.args.get('time_period', 'week') not in UNBOUNDED_PERIODS:
+        window = int(time.time() // WINDOW_SECONDS)
+        parts.append(window)
+        last_modified = max(last_modified, window * WINDOW_SECONDS)
+
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+    etag = f"{digest}-{version}"
+    return etag, datetime.fromtimestamp(last_modified, timezone.utc)
+
+
+def cached_view(view):
+    """
+    Serve a GET view with ETag/Last-Modified validation and a rendered-body cache.
+
+    Conditional requests that still match get a 304 after a single data-version
+    read. Other requests for an unchanged page get the cached body. The view
+    runs only when the data version or time window has moved on.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag, last_modified = cache_validators()
+
+        if request.if_none_match:
+            not_modified = etag in request.if_none_match
+        else:
+            not_modified = bool(request.if_modified_since) and last_modified <= request.if_modified_since
+
+        if not_modified:
+            response_cache.count("not_modified")
+            response = make_response('', 304)
+        else:
+            cached = response_cache.get(etag)
+            if cached is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response_cache.put(etag, (response.get_data(), response.mimetype))
+            else:
+                body, mimetype = cached
+                response = make_response(body)
+                response.mimetype = mimetype
+
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add(USER_HEADER)
+        return response
+
+    return wrapper
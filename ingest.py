@@ -0,0 +1,224 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+
+from storage import DB_FILE, entry_row, save_entries
+from shards import shard_bucket
+
+# A batch is committed when it reaches BATCH_SIZE rows or its first row has
+# waited FLUSH_INTERVAL_MS, whichever comes first. In "commit" mode callers are
+# blocked, so by default the writer does not linger: each batch is whatever
+# arrived while the previous commit was running.
+BATCH_SIZE = 256
+FLUSH_INTERVAL_MS = {"commit": 0, "enqueue": 20}
+
+# Entries waiting for the writer; submit blocks when the queue is full
+MAX_PENDING = 10000
+
+# "commit": submit's caller waits until its entry is committed (the default).
+# "enqueue": entries are acknowledged once queued, and anything still queued
+# when the process dies without a clean shutdown is lost.
+DURABILITY_MODES = ("commit", "enqueue")
+DEFAULT_DURABILITY = os.getenv("INGEST_DURABILITY", "commit")
+
+# Writer threads shared by all journal databases; each database always maps to
+# the same writer, so different users' files are committed in parallel
+WRITER_THREADS = 4
+
+
+class IngestQueue:
+    """
+    Write-behind queue that group-commits journal entries.
+
+    Callers hand rows to submit(); a single writer thread drains the queue and
+    inserts each batch with one executemany and one commit per database. If a
+    batch fails, its rows are retried one transaction each so a bad row only
+    fails itself. Once a batch is committed the writer indexes its entries for
+    similarity, leaving a large backlog to the index's background backfill.
+    """
+
+    def __init__(self, db_file=DB_FILE, batch_size=BATCH_SIZE,
+                 flush_interval_ms=None, durability=DEFAULT_DURABILITY,
+                 max_pending=MAX_PENDING):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}, got {durability!r}")
+        self.db_file = db_file
+        self.batch_size = batch_size
+        if flush_interval_ms is None:
+            flush_interval_ms = FLUSH_INTERVAL_MS[durability]
+        self.flush_interval = flush_interval_ms / 1000
+        self.durability = durability
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        # Signalled when the last submit_row in progress has queued its item
+        self._submitted = threading.Condition(self._lock)
+        self._submitting = 0
+        self._thread = None
+        self._closed = False
+        self.counters = {"entries": 0, "batches": 0, "failures": 0, "index_failures": 0}
+
+    def start(self):
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, emotion, prompt, response, x_coordinate=None, y_coordinate=None, db_file=None):
+        """
+        Queue an entry, timestamped now, for db_file (default: the queue's database).
+
+        Returns:
+            Future: resolves to None once the entry is committed, or raises the
+                    insert error. In "commit" mode this call waits for it first.
+        """
+        row = entry_row(emotion, prompt, response, x_coordinate, y_coordinate)
+        future = self.submit_row(row, db_file)
+        if self.durability == "commit":
+            future.result()
+        return future
+
+    def submit_row(self, row, db_file=None):
+        """Queue a prebuilt entry_row without waiting for the commit."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ingest queue is shut down")
+            self._start()
+            self._submitting += 1
+        future = Future()
+        try:
+            # Outside the lock: a full queue blocks here until the writer,
+            # which takes the lock for its counters, makes room
+            self._queue.put((db_file or self.db_file, row, future))
+        finally:
+            with self._lock:
+                self._submitting -= 1
+                if not self._submitting:
+                    self._submitted.notify_all()
+        return future
+
+    def flush(self):
+        """Block until everything queued so far is committed."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def shutdown(self):
+        """Stop accepting entries, commit what is queued and stop the writer."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # Items queued by submits already past the check must precede the sentinel
+            self._submitted.wait_for(lambda: not self._submitting)
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self.counters)
+        snapshot["pending"] = self._queue.qsize()
+        snapshot["durability"] = self.durability
+        return snapshot
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            stop = self._fill(batch, time.monotonic() + self.flush_interval)
+            self._commit(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _fill(self, batch, deadline):
+        """Add queued items to batch until it is full or the deadline passes; True on shutdown."""
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return False
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    def _commit(self, batch):
+        by_db = defaultdict(list)
+        for item in batch:
+            by_db[item[0]].append(item)
+        for db_file, items in by_db.items():
+            self._commit_db(db_file, items)
+
+    def _commit_db(self, db_file, batch):
+        try:
+            save_entries([row for _, row, _ in batch], db_file)
+            errors = [None] * len(batch)
+        except Exception:
+            errors = []
+            for _, row, _ in batch:
+                try:
+                    save_entries([row], db_file)
+                    errors.append(None)
+                except Exception as e:
+                    errors.append(e)
+
+        failed = sum(error is not None for error in errors)
+        with self._lock:
+            self.counters["batches"] += 1
+            self.counters["entries"] += len(batch) - failed
+            self.counters["failures"] += failed
+
+        for (_, _, future), error in zip(batch, errors):
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+        if failed < len(batch):
+            self._index(db_file)
+
+    def _index(self, db_file):
+        """Add the committed entries to the similarity index, after callers were released."""
+        try:
+            # numpy is only imported once the first entry is written
+            from similarity import catch_up_index
+            catch_up_index(db_file)
+        except Exception:
+            # The index catches up on its next sync, so a failure here loses nothing
+            with self._lock:
+                self.counters["index_failures"] += 1
+
+
+default_queues = [IngestQueue() for _ in range(WRITER_THREADS)]
+
+
+def queue_for(db_file):
+    """The shared writer responsible for db_file."""
+    return default_queues[shard_bucket(db_file) % len(default_queues)]
+
+
+def shutdown_queues():
+    """Commit everything still queued on the shared writers and stop them."""
+    for ingest in default_queues:
+        ingest.shutdown()
+
+
+atexit.register(shutdown_queues)
+
+
+def enqueue_entry(emotion, prompt, response, x_coordinate=None, y_coordinate=None, db_file=DB_FILE):
+    """Save an entry to db_file through the shared ingest queues (see IngestQueue.submit)."""
+    return queue_for(db_file).submit(emotion, prompt, response, x_coordinate, y_coordinate, db_file)
@@ -0,0 +1,175 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from storage import DB_FILE, connect, entry_row, save_entries
+
+# Columns written by export and read back by import, in file order
+EXPORT_FIELDS = ["id", "timestamp", "emotion", "prompt", "response", "x_coordinate", "y_coordinate"]
+
+FORMATS = ("jsonl", "csv")
+MIMETYPES = {"jsonl": "application/x-ndjson", "csv": "text/csv"}
+
+# Rows pulled from SQLite per fetchmany call while exporting
+EXPORT_FETCH_SIZE = 1000
+
+# Rows inserted per transaction while importing
+IMPORT_BATCH_SIZE = 5000
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def format_for(path, default="jsonl"):
+    """Guess the format from a file name's extension."""
+    for fmt in FORMATS:
+        if path and path.lower().endswith("." + fmt):
+            return fmt
+    return default
+
+
+def iter_entry_chunks(db_file=DB_FILE, fetch_size=EXPORT_FETCH_SIZE):
+    """
+    Yield every journal entry in id order, fetch_size rows at a time.
+
+    Uses its own connection so a slow consumer (e.g. a download) never holds
+    a read open on the request thread's shared connection.
+    """
+    conn = connect(db_file)
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(EXPORT_FIELDS)} FROM journal_entries ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        conn.close()
+
+
+def export_entries(fmt="jsonl", db_file=DB_FILE):
+    """
+    Stream the whole journal as text chunks in the given format.
+
+    Memory use is bounded by one fetch of rows, whatever the journal size.
+
+    Yields:
+        str: Consecutive pieces of the export file
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        for rows in iter_entry_chunks(db_file):
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for rows in iter_entry_chunks(db_file):
+            yield "".join(json.dumps(dict(row), ensure_ascii=False) + "\n" for row in rows)
+
+
+def read_records(file, fmt="jsonl"):
+    """Yield one dict per entry from an open text file in the given format."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+    if fmt == "csv":
+        reader = csv.DictReader(file)
+        try:
+            yield from reader
+        except csv.Error as e:
+            raise ValueError(f"After line {reader.line_num}: {e}") from None
+    else:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Line {line_number}: {e}") from None
+
+
+def _coordinate(value):
+    if value is None or value == "":
+        return None
+    return int(float(value))
+
+
+def record_to_row(record):
+    """
+    Convert an imported record to an entry_row, keeping its original timestamp.
+
+    Imported entries get new ids; an id in the record is ignored.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"Expected an object, got {type(record).__name__}")
+    missing = [field for field in ("emotion", "prompt", "response") if not record.get(field)]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+
+    timestamp = record.get("timestamp")
+    when = datetime.strptime(timestamp, TIMESTAMP_FORMAT) if timestamp else None
+    return entry_row(
+        record["emotion"], record["prompt"], record["response"],
+        _coordinate(record.get("x_coordinate")), _coordinate(record.get("y_coordinate")),
+        when=when,
+    )
+
+
+class ImportFailed(ValueError):
+    """
+    An import stopped at a bad record.
+
+    resume_at is how many leading records of the file are already in the
+    journal; importing again with skip=resume_at continues without duplicates.
+    """
+
+    def __init__(self, message, resume_at):
+        super().__init__(message)
+        self.resume_at = resume_at
+
+
+def import_entries(file, fmt="jsonl", db_file=DB_FILE, batch_size=IMPORT_BATCH_SIZE, skip=0):
+    """
+    Stream entries from an open file into journal_entries.
+
+    Rows are inserted batch_size at a time, each batch in one transaction, so
+    memory stays constant. A bad record stops the import: batches before it
+    stay committed and its own batch is dropped. Imported entries get new ids,
+    so importing the same file again would duplicate them; pass skip to start
+    after the records already imported.
+
+    Args:
+        skip (int): Leading records to pass over, e.g. ImportFailed.resume_at
+
+    Returns:
+        int: Number of entries imported
+
+    Raises:
+        ImportFailed: A record could not be read or converted
+    """
+    imported = 0
+    batch = []
+    try:
+        for number, record in enumerate(read_records(file, fmt), 1):
+            if number <= skip:
+                continue
+            try:
+                batch.append(record_to_row(record))
+            except ValueError as e:
+                raise ValueError(f"Record {number}: {e}") from None
+            if len(batch) >= batch_size:
+                save_entries(batch, db_file)
+                imported += len(batch)
+                batch = []
+    except ValueError as e:
+        raise ImportFailed(f"{e} ({imported} entries committed before it)", skip + imported) from None
+
+    save_entries(batch, db_file)
+    return imported + len(batch)
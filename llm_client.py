@@ -0,0 +1,589 @@
+import json
+import os
+import random
+import threading
+import time
+
+from dotenv import load_dotenv
+from metrics import record_llm_call, record_first_token
+from profiling import add_time
+
+# Every LLM caller (prompt_gen, mood_picker) imports this module first, so the
+# API key and URL in .env are loaded before anyone reads them
+load_dotenv()
+
+# OpenRouter endpoint; override with OPENROUTER_API_URL to point at a local stub server
+OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+# (connect, read) timeout per attempt, and the overall budget across retries
+DEFAULT_TIMEOUT = (3.05, 20)
+DEFAULT_DEADLINE = 30
+
+# Retry policy: bounded attempts with full-jitter exponential backoff
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 2.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Circuit breaker: open after this many consecutive failures, probe again after the cooldown
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+
+# Keep-alive pool size shared by all Flask worker threads
+POOL_SIZE = 16
+
+
+class LLMError(Exception):
+    """Raised when the LLM upstream could not produce a usable response."""
+
+
+class CircuitOpenError(LLMError):
+    """Raised without touching the network while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed: calls flow normally. open: calls fail fast until reset_timeout has
+    passed. half-open: a single trial call is let through; its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Return True if a call may go to the upstream right now."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class RateLimiter:
+    """Spaces call starts at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LLMClient:
+    """
+    Shared OpenRouter chat-completions client.
+
+    One requests.Session with a keep-alive connection pool is reused for every
+    call. Each call gets a per-attempt timeout and an overall deadline, transient
+    failures are retried with jitter, and a circuit breaker short-circuits calls
+    while the upstream is unhealthy.
+    """
+
+    def __init__(self, api_url=None, api_key=None, timeout=DEFAULT_TIMEOUT,
+                 max_retries=MAX_RETRIES, pool_size=POOL_SIZE, breaker=None):
+        self.api_url = api_url or OPENROUTER_API_URL
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    # Imported on first use so CLI commands that never call the LLM skip it
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def headers(self, api_key=None):
+        return _auth_headers(api_key or self.api_key)
+
+    def chat(self, payload, api_key=None, timeout=None, deadline=DEFAULT_DEADLINE, operation="chat"):
+        """
+        POST a chat-completions payload and return the decoded JSON body.
+
+        Args:
+            payload (dict): OpenRouter request body
+            api_key (str): Overrides the client/environment API key
+            timeout: Per-attempt requests timeout, defaults to the client's
+            deadline (float): Seconds allowed for all attempts together
+            operation (str): Metrics label naming what the call is for
+
+        Raises:
+            CircuitOpenError: The breaker is open, no request was made
+            LLMError: All attempts failed or the upstream rejected the request
+        """
+        started = time.perf_counter()
+        try:
+            body = self._chat(payload, api_key, timeout, deadline)
+        except Exception as e:
+            _record(operation, payload, started, outcome_of(e))
+            raise
+        _record(operation, payload, started, "ok", body)
+        return body
+
+    def _chat(self, payload, api_key, timeout, deadline):
+        import requests
+
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM upstream unavailable (circuit open)")
+
+        timeout = timeout or self.timeout
+        started = time.monotonic()
+        last_error = None
+        # Every way out of here must settle the breaker, or a half-open trial
+        # would stay in flight and allow() would refuse calls for good
+        settled = False
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+                attempt_timeout = _cap_timeout(timeout, remaining)
+
+                try:
+                    response = self.session.post(
+                        self.api_url,
+                        headers=self.headers(api_key),
+                        json=payload,
+                        timeout=attempt_timeout
+                    )
+                except requests.RequestException as e:
+                    # Connection errors, timeouts, and bodies cut off mid-transfer
+                    last_error = LLMError(f"Request failed: {e}")
+                else:
+                    if response.status_code == 200:
+                        try:
+                            body = response.json()
+                        except ValueError:
+                            last_error = LLMError("Invalid JSON in LLM response")
+                        else:
+                            settled = True
+                            self.breaker.record_success()
+                            return body
+                    elif response.status_code in RETRY_STATUSES:
+                        last_error = LLMError(f"{response.status_code} - {response.text}")
+                    else:
+                        # Client errors are not an upstream health problem, don't retry them
+                        settled = True
+                        self.breaker.record_success()
+                        raise LLMError(f"{response.status_code} - {response.text}")
+
+                if attempt < self.max_retries:
+                    delay = backoff_delay(attempt)
+                    if time.monotonic() - started + delay >= deadline:
+                        break
+                    time.sleep(delay)
+
+            raise last_error or LLMError("LLM request deadline exceeded")
+        finally:
+            if not settled:
+                self.breaker.record_failure()
+
+    def stream_chat(self, payload, api_key=None, timeout=None, operation="chat"):
+        """
+        POST a chat-completions payload with stream: true and yield content as it arrives.
+
+        There are no retries: once tokens have been shown, a retry would repeat
+        them, so callers fall back instead. The read timeout bounds the gap
+        between chunks rather than the whole completion.
+
+        Yields:
+            str: Content deltas, in order
+
+        Raises:
+            CircuitOpenError: The breaker is open, no request was made
+            LLMError: The request failed, was rejected, or the stream broke off
+        """
+        import requests
+
+        model = payload.get("model", "")
+        started = time.perf_counter()
+        if not self.breaker.allow():
+            _record(operation, payload, started, "circuit_open")
+            raise CircuitOpenError("LLM upstream unavailable (circuit open)")
+
+        usage = None
+        streamed = False
+        try:
+            with self.session.post(
+                self.api_url,
+                headers=self.headers(api_key),
+                json=dict(payload, stream=True),
+                timeout=timeout or self.timeout,
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    if response.status_code in RETRY_STATUSES:
+                        self.breaker.record_failure()
+                    else:
+                        # Client errors are not an upstream health problem
+                        self.breaker.record_success()
+                    raise LLMError(f"{response.status_code} - {response.text}")
+
+                # Accepted: recorded now, since the caller may stop reading mid-stream
+                self.breaker.record_success()
+                # chunk_size=None hands over each transfer chunk as it lands; the
+                # default 512-byte reads would hold back the first tokens
+                lines = response.iter_lines(chunk_size=None, decode_unicode=True)
+                try:
+                    for chunk in _sse_chunks(lines):
+                        usage = chunk.get("usage") or usage
+                        text = _delta_text(chunk)
+                        if text:
+                            if not streamed:
+                                streamed = True
+                                record_first_token(operation, model, time.perf_counter() - started)
+                            yield text
+                except LLMError:
+                    self.breaker.record_failure()
+                    raise
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            _record(operation, payload, started, "upstream_error")
+            raise LLMError(f"Stream failed: {e}") from e
+        except LLMError as e:
+            _record(operation, payload, started, outcome_of(e))
+            raise
+
+        _record(operation, payload, started, "ok", {"usage": usage})
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+class AsyncLLMClient:
+    """
+    asyncio counterpart of LLMClient built on httpx.AsyncClient.
+
+    Uses the same retry policy and, by default, the same circuit breaker as the
+    synchronous client so both paths agree on upstream health. A single
+    AsyncClient keeps a keep-alive pool large enough for hundreds of in-flight
+    requests on one event loop.
+    """
+
+    def __init__(self, api_url=None, api_key=None, timeout=DEFAULT_TIMEOUT,
+                 max_retries=MAX_RETRIES, max_connections=256, breaker=None):
+        self.api_url = api_url or OPENROUTER_API_URL
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self.breaker = breaker or CircuitBreaker()
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            # httpx is only needed by the async path, so it is imported on first use
+            import httpx
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            )
+            self._client = httpx.AsyncClient(limits=limits)
+        return self._client
+
+    def headers(self, api_key=None):
+        return _auth_headers(api_key or self.api_key)
+
+    async def chat(self, payload, api_key=None, timeout=None, deadline=DEFAULT_DEADLINE, operation="chat"):
+        """Async version of LLMClient.chat with identical semantics."""
+        started = time.perf_counter()
+        try:
+            body = await self._chat(payload, api_key, timeout, deadline)
+        except Exception as e:
+            _record(operation, payload, started, outcome_of(e))
+            raise
+        _record(operation, payload, started, "ok", body)
+        return body
+
+    async def _chat(self, payload, api_key, timeout, deadline):
+        import asyncio
+        import httpx
+
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM upstream unavailable (circuit open)")
+
+        timeout = timeout or self.timeout
+        started = time.monotonic()
+        last_error = None
+        # As in LLMClient._chat; this includes cancellation while awaiting
+        settled = False
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+                connect_timeout, read_timeout = _cap_timeout(_as_pair(timeout), remaining)
+
+                try:
+                    response = await self.client.post(
+                        self.api_url,
+                        headers=self.headers(api_key),
+                        json=payload,
+                        timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+                    )
+                except httpx.HTTPError as e:
+                    last_error = LLMError(f"Request failed: {e}")
+                else:
+                    if response.status_code == 200:
+                        try:
+                            body = response.json()
+                        except ValueError:
+                            last_error = LLMError("Invalid JSON in LLM response")
+                        else:
+                            settled = True
+                            self.breaker.record_success()
+                            return body
+                    elif response.status_code in RETRY_STATUSES:
+                        last_error = LLMError(f"{response.status_code} - {response.text}")
+                    else:
+                        settled = True
+                        self.breaker.record_success()
+                        raise LLMError(f"{response.status_code} - {response.text}")
+
+                if attempt < self.max_retries:
+                    delay = backoff_delay(attempt)
+                    if time.monotonic() - started + delay >= deadline:
+                        break
+                    await asyncio.sleep(delay)
+
+            raise last_error or LLMError("LLM request deadline exceeded")
+        finally:
+            if not settled:
+                self.breaker.record_failure()
+
+    async def stream_chat(self, payload, api_key=None, timeout=None, operation="chat"):
+        """
+        Async version of LLMClient.stream_chat with identical semantics.
+
+        Yields:
+            str: Content deltas, in order
+
+        Raises:
+            CircuitOpenError: The breaker is open, no request was made
+            LLMError: The request failed, was rejected, or the stream broke off
+        """
+        import httpx
+
+        model = payload.get("model", "")
+        started = time.perf_counter()
+        if not self.breaker.allow():
+            _record(operation, payload, started, "circuit_open")
+            raise CircuitOpenError("LLM upstream unavailable (circuit open)")
+
+        connect_timeout, read_timeout = _as_pair(timeout or self.timeout)
+        usage = None
+        streamed = False
+        # As in _chat: settle the breaker on every way out before the stream is
+        # accepted, including cancellation while waiting for the response
+        settled = False
+        try:
+            async with self.client.stream(
+                "POST",
+                self.api_url,
+                headers=self.headers(api_key),
+                json=dict(payload, stream=True),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    settled = True
+                    if response.status_code in RETRY_STATUSES:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                    raise LLMError(f"{response.status_code} - {response.text}")
+
+                settled = True
+                self.breaker.record_success()
+                try:
+                    async for chunk in _async_sse_chunks(response.aiter_lines()):
+                        usage = chunk.get("usage") or usage
+                        text = _delta_text(chunk)
+                        if text:
+                            if not streamed:
+                                streamed = True
+                                record_first_token(operation, model, time.perf_counter() - started)
+                            yield text
+                except (LLMError, httpx.HTTPError):
+                    self.breaker.record_failure()
+                    raise
+        except httpx.HTTPError as e:
+            _record(operation, payload, started, "upstream_error")
+            raise LLMError(f"Stream failed: {e}") from e
+        except LLMError as e:
+            _record(operation, payload, started, outcome_of(e))
+            raise
+        finally:
+            if not settled:
+                self.breaker.record_failure()
+
+        _record(operation, payload, started, "ok", {"usage": usage})
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def outcome_of(error):
+    """
+    Short reason an LLM answer couldn't be used, for metrics labels.
+
+    Returns:
+        str: "circuit_open", "upstream_error" (request failed or was rejected),
+             or "bad_response" (the reply couldn't be parsed or was unusable)
+    """
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, LLMError):
+        return "upstream_error"
+    return "bad_response"
+
+
+# Returned by _sse_chunk for the [DONE] line that ends a stream
+_SSE_DONE = object()
+
+
+def _sse_chunk(line):
+    """Chunk dict of one OpenRouter server-sent event line, None for lines without data, or _SSE_DONE."""
+    # Blank lines separate events; lines starting with ':' are keep-alive comments
+    if not line or not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return _SSE_DONE
+    try:
+        return json.loads(data)
+    except ValueError:
+        raise LLMError("Invalid JSON in LLM stream") from None
+
+
+def _sse_chunks(lines):
+    """Decode OpenRouter server-sent events into chunk dicts, stopping at [DONE]."""
+    for line in lines:
+        chunk = _sse_chunk(line)
+        if chunk is _SSE_DONE:
+            return
+        if chunk is not None:
+            yield chunk
+
+
+async def _async_sse_chunks(lines):
+    """_sse_chunks over an async iterator of lines."""
+    async for line in lines:
+        chunk = _sse_chunk(line)
+        if chunk is _SSE_DONE:
+            return
+        if chunk is not None:
+            yield chunk
+
+
+def _delta_text(chunk):
+    choices = chunk.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content")
+
+
+def _record(operation, payload, started, outcome, body=None):
+    elapsed = time.perf_counter() - started
+    record_llm_call(operation, payload.get("model", ""), elapsed, outcome, body)
+    add_time("upstream", elapsed)
+
+
+def _auth_headers(api_key):
+    key = api_key or os.getenv("OPENROUTER_API_KEY")
+    return {
+        "Authorization": f"Bearer {key}",
+        "Content-Type": "application/json"
+    }
+
+
+def _as_pair(timeout):
+    return timeout if isinstance(timeout, tuple) else (timeout, timeout)
+
+
+def _cap_timeout(timeout, remaining):
+    """Shrink a requests timeout so a single attempt can't outlive the deadline."""
+    if isinstance(timeout, tuple):
+        return tuple(min(part, remaining) for part in timeout)
+    return min(timeout, remaining)
+
+
+# Process-wide clients shared by the mood mapper and the prompt generator.
+# Both report to one circuit breaker.
+default_client = LLMClient()
+default_async_client = AsyncLLMClient(breaker=default_client.breaker)
+
+
+def get_client():
+    """Return the shared LLM client."""
+    return default_client
+
+
+def get_async_client():
+    """Return the shared asyncio LLM client."""
+    return default_async_client
@@ -1,6 +1,9 @@
 import sys
-from mood_picker import MoodCoordinateMapper
-from prompt_gen import generate_prompt, save_entry, create_db
+import argparse
+from storage import DB_FILE, save_entry, create_db, rebuild_rollup
+from search import search_entries, SEARCH_LIMIT
+from journal_io import export_entries, import_entries, format_for, FORMATS, ImportFailed
+from shards import db_for_user
 
 def get_emotion():
     """
@@ -16,6 +19,8 @@ def get_emotion():
                 x = float(input("\nEnter X coordinate (-100 to 100, negative=bad to positive=good): "))
                 y = float(input("Enter Y coordinate (-100 to 100, low to high energy): "))
                 
+                # The LLM stack is imported only by the interactive flow that needs it
+                from mood_picker import MoodCoordinateMapper
                 mapper = MoodCoordinateMapper()
                 emotion = mapper.get_mood_from_coordinates(x, y)
                 return emotion, (x, y)
@@ -47,13 +52,13 @@ def get_journal_response(prompt):
     
     return "\n".join(lines[:-1])  # Remove the last empty line
 
-def main():
+def journal_session(db_file=DB_FILE):
     """
-    Main CLI interface for the mood journal
+    Interactive flow: pick an emotion, answer a prompt, save the entry
     """
     try:
         # Ensure database exists
-        create_db()
+        create_db(db_file)
         
         print("\n=== Welcome to Your Mood Journal ===")
         
@@ -61,14 +66,16 @@ def main():
         emotion, coordinates = get_emotion()
         print(f"\nRecorded emotion: {emotion.capitalize()}")
         
-        # Generate and display prompt
-        prompt = generate_prompt(emotion)
+        # Generate and display prompt, avoiding ones close to recent entries
+        from prompt_gen import generate_prompt
+        from similarity import prompt_filter
+        prompt = generate_prompt(emotion, prompt_filter(db_file))
         
         # Get journal response
         response = get_journal_response(prompt)
         
         # Save to database
-        save_entry(emotion, prompt, response)
+        save_entry(emotion, prompt, response, db_file=db_file)
         
         print("\n✓ Journal entry saved successfully!")
         
@@ -83,5 +90,141 @@ def main():
         print(f"\nError: {e}")
         sys.exit(1)
 
+def rebuild_rollup_command(args):
+    """
+    Recompute the daily mood rollup table from all journal entries
+    """
+    rebuild_rollup(args.db_file)
+    print("✓ Daily mood rollup rebuilt.")
+
+def rebuild_index_command(args):
+    """
+    Re-index every journal entry for related entries and prompt dedup
+    """
+    from similarity import rebuild_index
+    count = rebuild_index(args.db_file)
+    print(f"✓ Similarity index rebuilt from {count} entries.")
+
+def related_command(args):
+    """
+    Print the past entries most similar to one entry
+    """
+    from similarity import related_entries, sync_index
+    # Index everything first: a background backfill would not outlive the command
+    sync_index(args.db_file)
+    results = related_entries(args.entry_id, args.limit, args.db_file)
+    
+    if not results:
+        print("No related entries.")
+        return
+    
+    for result in results:
+        print(f"\n#{result['id']}  {result['timestamp']}  ({result['emotion']})  similarity {result['score']:.2f}")
+        print(f"Prompt: {result['prompt']}")
+        print(f"Entry:  {result['preview']}{'...' if result['truncated'] else ''}")
+
+def search_command(args):
+    """
+    Print past entries matching a full-text query, best matches first
+    """
+    results = search_entries(" ".join(args.query), args.limit, args.db_file)
+    
+    if not results:
+        print("No matching entries.")
+        return
+    
+    for result in results:
+        print(f"\n#{result['id']}  {result['timestamp']}  ({result['emotion']})")
+        print(f"Prompt: {result['prompt_snippet']}")
+        print(f"Entry:  {result['response_snippet']}")
+
+def export_command(args):
+    """
+    Write every journal entry to a file (or stdout) as JSONL or CSV
+    """
+    db_file = args.db_file
+    fmt = args.format or format_for(args.output)
+    
+    if args.output in (None, "-"):
+        for chunk in export_entries(fmt, db_file):
+            sys.stdout.write(chunk)
+        return
+    
+    with open(args.output, "w", encoding="utf-8", newline="") as f:
+        for chunk in export_entries(fmt, db_file):
+            f.write(chunk)
+    print(f"✓ Journal exported to {args.output}.")
+
+def import_command(args):
+    """
+    Load journal entries from a JSONL or CSV file (or stdin)
+    """
+    db_file = args.db_file
+    fmt = args.format or format_for(args.input)
+    
+    try:
+        if args.input == "-":
+            count = import_entries(sys.stdin, fmt, db_file, skip=args.skip)
+        else:
+            with open(args.input, encoding="utf-8", newline="") as f:
+                count = import_entries(f, fmt, db_file, skip=args.skip)
+    except ImportFailed as e:
+        sys.exit(f"Import failed: {e}\nFix the record and rerun with --skip {e.resume_at} to continue.")
+    except (OSError, ValueError) as e:
+        sys.exit(f"Import failed: {e}")
+    print(f"✓ Imported {count} entries.")
+    
+    # Index them now rather than on the web app's first prompt or save
+    from similarity import sync_index
+    sync_index(db_file)
+    print("✓ Similarity index updated.")
+
+def main():
+    """
+    Main CLI interface for the mood journal
+    """
+    parser = argparse.ArgumentParser(description="Mood journal. Run without a command to write an entry.")
+    parser.add_argument("-u", "--user", help="use this user's journal instead of the default one")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    rollup_parser = subparsers.add_parser("rebuild-rollup", help="rebuild the daily mood rollup table")
+    rollup_parser.set_defaults(func=rebuild_rollup_command)
+    
+    index_parser = subparsers.add_parser("rebuild-index", help="rebuild the similarity index used for related entries")
+    index_parser.set_defaults(func=rebuild_index_command)
+    
+    related_parser = subparsers.add_parser("related", help="show past entries similar to an entry")
+    related_parser.add_argument("entry_id", type=int, help="id of the entry, as shown by search")
+    related_parser.add_argument("-n", "--limit", type=int, default=5, help="maximum number of results")
+    related_parser.set_defaults(func=related_command)
+    
+    search_parser = subparsers.add_parser("search", help="search past entries")
+    search_parser.add_argument("query", nargs="+", help="words to search for (end a word with * for prefix matching)")
+    search_parser.add_argument("-n", "--limit", type=int, default=SEARCH_LIMIT, help="maximum number of results")
+    search_parser.set_defaults(func=search_command)
+    
+    export_parser = subparsers.add_parser("export", help="export all entries as JSONL or CSV")
+    export_parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    export_parser.add_argument("-f", "--format", choices=FORMATS, help="default: from the file extension, else jsonl")
+    export_parser.set_defaults(func=export_command)
+    
+    import_parser = subparsers.add_parser("import", help="import entries from a JSONL or CSV file")
+    import_parser.add_argument("input", help="file to read, or - for stdin")
+    import_parser.add_argument("-f", "--format", choices=FORMATS, help="default: from the file extension, else jsonl")
+    import_parser.add_argument("--skip", type=int, default=0, help="skip this many leading records (resume a failed import)")
+    import_parser.set_defaults(func=import_command)
+    
+    args = parser.parse_args()
+    try:
+        # Also creates the journal, so every command can assume it exists
+        args.db_file = db_for_user(args.user)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.command is None:
+        journal_session(args.db_file)
+    else:
+        args.func(args)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
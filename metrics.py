@@ -0,0 +1,201 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds (seconds) of the LLM latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30)
+
+# Upper bounds of the per-call token histogram buckets
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with a fixed set of label names.
+
+    observe() is a bisect plus three additions under a lock, so it is safe to
+    call on every request.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for label_values, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, label_values, [("le", _format_number(bound))])
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum", labels, round(total, 6)
+            yield f"{self.name}_count", labels, count
+
+
+class Collector:
+    """
+    Metric read from a callback when /metrics is scraped.
+
+    Used for components that already keep their own counters (the mood
+    resolver, the prompt pool), so their hot paths don't change at all.
+    """
+
+    def __init__(self, name, help, kind, label, read):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.label = label
+        self.read = read
+
+    def samples(self):
+        for key, value in sorted(self.read().items()):
+            yield self.name, _format_labels((self.label,), (key,)), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collector(self, name, help, label, read, kind="counter"):
+        return self.register(Collector(name, help, kind, label, read))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ---- LLM calls ----
+
+llm_request_seconds = registry.histogram(
+    "moodjournal_llm_request_seconds",
+    "Wall time of LLM calls including retries",
+    labels=("operation", "model", "outcome"),
+)
+llm_first_token_seconds = registry.histogram(
+    "moodjournal_llm_first_token_seconds",
+    "Time from sending a streaming LLM request to its first content token",
+    labels=("operation", "model"),
+)
+llm_tokens = registry.histogram(
+    "moodjournal_llm_tokens",
+    "Tokens per LLM call, from the response usage field",
+    labels=("operation", "model", "kind"),
+    buckets=TOKEN_BUCKETS,
+)
+llm_fallbacks = registry.counter(
+    "moodjournal_llm_fallbacks_total",
+    "Answers served without a usable LLM response",
+    labels=("operation", "reason"),
+)
+
+
+def record_llm_call(operation, model, seconds, outcome, body=None):
+    """
+    Record one LLM call's latency and, for successful calls, its token usage.
+
+    Args:
+        operation (str): What the call was for, e.g. "mood" or "prompt"
+        model (str): Model named in the request payload
+        seconds (float): Wall time including retries and backoff
+        outcome (str): "ok", or the failure reason from llm_client.outcome_of
+        body (dict): Decoded response, read for its "usage" field
+    """
+    llm_request_seconds.observe(seconds, operation, model, outcome)
+    usage = body.get("usage") if isinstance(body, dict) else None
+    if usage:
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if isinstance(usage.get(kind), (int, float)):
+                llm_tokens.observe(usage[kind], operation, model, kind[:-len("_tokens")])
+
+
+def record_first_token(operation, model, seconds):
+    """Record time-to-first-token of a streaming LLM call."""
+    llm_first_token_seconds.observe(seconds, operation, model)
+
+
+def record_fallback(operation, reason):
+    """Count an answer served from a fallback, with why the LLM answer wasn't used."""
+    llm_fallbacks.inc(operation, reason)
+
+
+def render_metrics():
+    return registry.render()
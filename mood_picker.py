@@ -1,15 +1,32 @@
-import requests
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from llm_client import get_client, get_async_client, CircuitOpenError, RateLimiter, outcome_of
+from metrics import record_fallback
+from mood_resolver import resolve_mood, resolve_mood_async, default_resolver, MoodUnavailable
+from palette import quadrant_label
 
 # Load environment variables from .env file (for API key)
 load_dotenv()
 
+MODEL = "anthropic/claude-3-opus-20240229"
+
+# Batch resolution: points per LLM request, parallel requests, and request starts per second
+BATCH_SIZE = 25
+BATCH_CONCURRENCY = 4
+BATCH_RATE_LIMIT = 2
+
+batch_rate_limiter = RateLimiter(BATCH_RATE_LIMIT)
+
 class MoodCoordinateMapper:
     def __init__(self):
-        # Try to get API key from environment
+        # Try to get API key from environment; only checked once a point needs the LLM,
+        # so coordinates the local resolver answers work without one
         self.api_key = os.getenv("OPENROUTER_API_KEY")
+    
+    def require_api_key(self):
+        """Raise before an LLM call if no API key is configured."""
         if not self.api_key:
             raise ValueError("OpenRouter API key not found. Please set OPENROUTER_API_KEY environment variable.")
     
@@ -24,67 +41,165 @@ class MoodCoordinateMapper:
         Returns:
             str: A mood word
         """
+        self.validate_coordinates(x, y)
+            
+        # Resolve locally first, calling the LLM API only on a cache miss
+        return resolve_mood(x, y, self.get_mood_from_api)
+    
+    async def get_mood_from_coordinates_async(self, x, y):
+        """Async variant of get_mood_from_coordinates for the ASGI app."""
+        self.validate_coordinates(x, y)
+        return await resolve_mood_async(x, y, self.get_mood_from_api_async)
+    
+    def get_moods_batch(self, points):
+        """
+        Get mood words for many (x, y) points at once.
+        
+        Points answered by the local resolver never leave the process. The rest are
+        deduplicated by quantized cell, packed BATCH_SIZE to a request, and sent
+        concurrently under the batch rate limit. Cells a request fails to answer
+        get the nearest lexicon word.
+        
+        Args:
+            points (list): (x, y) pairs, each from -100 to 100
+            
+        Returns:
+            list: Mood words in the same order as points
+        """
+        points = [(x, y) for x, y in points]
+        for x, y in points:
+            self.validate_coordinates(x, y)
+        
+        return default_resolver.resolve_many(points, self.get_moods_from_api)
+    
+    def get_moods_from_api(self, cells):
+        """Resolve many cells with packed, concurrent LLM requests; returns {cell: mood}."""
+        self.require_api_key()
+        chunks = [cells[i:i + BATCH_SIZE] for i in range(0, len(cells), BATCH_SIZE)]
+        moods = {}
+        
+        with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as executor:
+            for chunk, words in zip(chunks, executor.map(self.get_mood_chunk_from_api, chunks)):
+                moods.update(zip(chunk, words))
+        
+        return {cell: mood for cell, mood in moods.items() if mood}
+    
+    def get_mood_chunk_from_api(self, chunk):
+        """One LLM request for up to BATCH_SIZE cells; returns a word per cell, or [] on failure."""
+        batch_rate_limiter.wait()
+        try:
+            response_json = get_client().chat(self.build_batch_payload(chunk), api_key=self.api_key,
+                                              deadline=30, operation="mood_batch")
+            content = response_json["choices"][0]["message"]["content"]
+            words = json.loads(content[content.index("["):content.rindex("]") + 1])
+        except Exception as e:
+            record_fallback("mood_batch", outcome_of(e))
+            return []
+        
+        if not isinstance(words, list) or len(words) != len(chunk):
+            record_fallback("mood_batch", "bad_response")
+            return []
+        return [self.clean_mood_word(str(word)) for word in words]
+    
+    def build_batch_payload(self, chunk):
+        lines = "\n".join(f"{i}. x={x}, y={y}" for i, (x, y) in enumerate(chunk, 1))
+        prompt = f"""
+        For each numbered point below, give exactly one word that describes the mood or
+        emotional state at that point.
+        
+        The X-axis (-100 to +100) represents the valence from negative to positive emotions.
+        The Y-axis (-100 to +100) represents the arousal/energy level from low to high.
+        
+        {lines}
+        
+        Respond with ONLY a JSON array of {len(chunk)} strings, one word per point, in order.
+        """
+        return {
+            "model": MODEL,
+            "messages": [
+                {"role": "system", "content": "You are an expert psychologist specializing in emotions and mood states."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 10 * len(chunk) + 50
+        }
+    
+    def clean_mood_word(self, content):
+        """Reduce an LLM answer to a single capitalized word."""
+        words = content.strip().split()
+        if not words:
+            return ""
+        return words[0].strip('.,;:"\'!?').lower().capitalize()
+    
+    def validate_coordinates(self, x, y):
         # Validate range
         if x < -100 or x > 100 or y < -100 or y > 100:
             raise ValueError("Coordinates must be between -100 and 100")
-            
-        # Call LLM API
-        return self.get_mood_from_api(x, y)
     
     def get_mood_from_api(self, x, y):
+        self.require_api_key()
+        data = self.build_payload(x, y)
+        
+        try:
+            response_json = get_client().chat(data, api_key=self.api_key, deadline=15, operation="mood")
+        except CircuitOpenError:
+            # Upstream is unhealthy: the resolver answers from the local lexicon
+            # instead of waiting, without caching that answer for the cell
+            record_fallback("mood", "circuit_open")
+            raise MoodUnavailable("LLM circuit open") from None
+        except Exception as e:
+            record_fallback("mood", outcome_of(e))
+            return f"Error: {str(e)}"
+        
+        return self.parse_mood_response(response_json)
+    
+    async def get_mood_from_api_async(self, x, y):
+        self.require_api_key()
+        data = self.build_payload(x, y)
+        
+        try:
+            response_json = await get_async_client().chat(data, api_key=self.api_key, deadline=15, operation="mood")
+        except CircuitOpenError:
+            record_fallback("mood", "circuit_open")
+            raise MoodUnavailable("LLM circuit open") from None
+        except Exception as e:
+            record_fallback("mood", outcome_of(e))
+            return f"Error: {str(e)}"
+        
+        return self.parse_mood_response(response_json)
+    
+    def build_payload(self, x, y):
         # Prepare prompt based on coordinates
         prompt = self.generate_prompt(x, y)
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         # Try with Claude model instead of Gemini
-        data = {
-            "model": "anthropic/claude-3-opus-20240229", # Try another model since Gemini returns empty response
+        return {
+            "model": MODEL, # Try another model since Gemini returns empty response
             "messages": [
                 {"role": "system", "content": "You are an expert psychologist specializing in emotions and mood states."},
                 {"role": "user", "content": prompt}
             ],
             "max_tokens": 50
         }
-        
-        try:
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                data=json.dumps(data)
-            )
-            
-            if response.status_code == 200:
-                response_json = response.json()
+    
+    def parse_mood_response(self, response_json):
+        # Check if we have a valid response structure
+        if "choices" in response_json and len(response_json["choices"]) > 0:
+            if "message" in response_json["choices"][0] and "content" in response_json["choices"][0]["message"]:
+                content = response_json["choices"][0]["message"]["content"]
                 
-                # Debug information
-                print("API Response:", json.dumps(response_json, indent=2))
+                # Check if content is empty
+                if not content or content.strip() == "":
+                    record_fallback("mood", "empty_response")
+                    raise MoodUnavailable("LLM returned an empty mood")
                 
-                # Check if we have a valid response structure
-                if "choices" in response_json and len(response_json["choices"]) > 0:
-                    if "message" in response_json["choices"][0] and "content" in response_json["choices"][0]["message"]:
-                        content = response_json["choices"][0]["message"]["content"]
-                        
-                        # Check if content is empty
-                        if not content or content.strip() == "":
-                            return "Excited"  # Default for positive high energy
-                        
-                        # Non-empty content - extract the word
-                        mood_word = content.strip().split()[0].strip('.,;:"\'!?').lower()
-                        return mood_word.capitalize()
-                    else:
-                        return "Error: Unexpected response structure - message/content not found"
-                else:
-                    return "Error: No choices in response"
-                    
+                # Non-empty content - extract the word
+                return self.clean_mood_word(content)
             else:
-                return f"Error: {response.status_code} - {response.text}"
-        
-        except Exception as e:
-            return f"Error: {str(e)}"
+                record_fallback("mood", "bad_response")
+                return "Error: Unexpected response structure - message/content not found"
+        else:
+            record_fallback("mood", "bad_response")
+            return "Error: No choices in response"
     
     def generate_prompt(self, x, y):
         # Create description based on coordinates
@@ -133,17 +248,7 @@ if __name__ == "__main__":
         print(f"This represents a mood that is: {mood}")
         
         # Print quadrant information for context
-        quadrant = ""
-        if x >= 0 and y >= 0:
-            quadrant = "Positive emotion, High energy"
-        elif x < 0 and y >= 0:
-            quadrant = "Negative emotion, High energy"
-        elif x < 0 and y < 0:
-            quadrant = "Negative emotion, Low energy"
-        else:
-            quadrant = "Positive emotion, Low energy"
-            
-        print(f"Quadrant: {quadrant}")
+        print(f"Quadrant: {quadrant_label(x, y)}")
         
     except Exception as e:
         print(f"Error: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,328 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Grid used to quantize coordinates before lookups (cells are GRID_STEP wide)
+GRID_STEP = 5
+COORD_MIN = -100
+COORD_MAX = 100
+
+# A lexicon word answers directly when the point lies within this distance of it
+LEXICON_RADIUS = 10
+
+# In-memory LRU size and the SQLite file holding LLM answers across restarts
+CACHE_SIZE = 2048
+MOOD_CACHE_FILE = "mood_cache.db"
+
+# Valence/arousal lexicon on the same -100..100 square as the mood picker.
+# x is valence (negative to positive), y is arousal (low to high energy).
+MOOD_LEXICON = [
+    ("Ecstatic", 85, 85),
+    ("Elated", 75, 65),
+    ("Excited", 60, 80),
+    ("Enthusiastic", 50, 60),
+    ("Energized", 35, 75),
+    ("Happy", 75, 35),
+    ("Joyful", 85, 50),
+    ("Cheerful", 60, 30),
+    ("Optimistic", 45, 20),
+    ("Pleased", 55, 10),
+    ("Content", 65, -30),
+    ("Satisfied", 50, -20),
+    ("Grateful", 75, -10),
+    ("Relaxed", 60, -55),
+    ("Calm", 45, -70),
+    ("Serene", 75, -75),
+    ("Peaceful", 85, -60),
+    ("Restful", 30, -85),
+    ("Neutral", 0, 0),
+    ("Alert", 10, 55),
+    ("Surprised", 15, 85),
+    ("Tense", -35, 60),
+    ("Nervous", -45, 70),
+    ("Anxious", -55, 55),
+    ("Stressed", -60, 75),
+    ("Angry", -75, 80),
+    ("Furious", -90, 90),
+    ("Frustrated", -60, 40),
+    ("Irritated", -45, 30),
+    ("Annoyed", -30, 20),
+    ("Afraid", -70, 65),
+    ("Disappointed", -50, -20),
+    ("Sad", -70, -40),
+    ("Lonely", -60, -55),
+    ("Gloomy", -75, -60),
+    ("Depressed", -85, -80),
+    ("Miserable", -90, -45),
+    ("Bored", -35, -65),
+    ("Tired", -15, -80),
+    ("Exhausted", -40, -90),
+    ("Sleepy", 5, -90),
+    ("Apathetic", -20, -50),
+    ("Melancholy", -40, -35),
+    ("Uneasy", -25, 5),
+]
+
+
+class MoodUnavailable(Exception):
+    """
+    Raised by a fetch callable that has no answer worth caching (upstream
+    unavailable, empty answer); the resolver falls back to the nearest lexicon
+    word for that call only.
+    """
+
+
+def quantize(value, step=GRID_STEP):
+    """Snap a coordinate to the centre of its grid cell, clamped to the valid range."""
+    snapped = int(round(value / step)) * step
+    return max(COORD_MIN, min(COORD_MAX, snapped))
+
+
+def _build_lexicon_grid(step):
+    """Precompute the nearest lexicon word (and its distance) for every grid cell."""
+    grid = {}
+    for qx in range(COORD_MIN, COORD_MAX + 1, step):
+        for qy in range(COORD_MIN, COORD_MAX + 1, step):
+            best_word, best_dist = None, None
+            for word, lx, ly in MOOD_LEXICON:
+                dist = ((qx - lx) ** 2 + (qy - ly) ** 2) ** 0.5
+                if best_dist is None or dist < best_dist:
+                    best_word, best_dist = word, dist
+            grid[(qx, qy)] = (best_word, best_dist)
+    return grid
+
+
+class MoodResolver:
+    """
+    Resolves (x, y) coordinates to a mood word without going remote when possible.
+
+    Lookups go through three layers in order: the precomputed lexicon grid, an
+    LRU + SQLite cache of earlier LLM answers keyed by quantized coordinates, and
+    finally the supplied fetch callable on a true miss.
+    """
+
+    def __init__(self, grid_step=GRID_STEP, lexicon_radius=LEXICON_RADIUS,
+                 cache_size=CACHE_SIZE, cache_file=MOOD_CACHE_FILE):
+        self.grid_step = grid_step
+        self.lexicon_radius = lexicon_radius
+        self.cache_size = cache_size
+        self.cache_file = cache_file
+        self._lexicon_grid = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_ready = False
+        self.counters = {
+            "lexicon_hits": 0,
+            "cache_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+        }
+
+    @property
+    def _grid(self):
+        # Built on first lookup rather than at import, which CLI commands that
+        # never resolve a mood would otherwise pay for
+        if self._lexicon_grid is None:
+            self._lexicon_grid = _build_lexicon_grid(self.grid_step)
+        return self._lexicon_grid
+
+    def cell(self, x, y):
+        """Return the quantized cache key for a coordinate pair."""
+        return quantize(x, self.grid_step), quantize(y, self.grid_step)
+
+    def nearest_lexicon_mood(self, x, y):
+        """Return the closest lexicon word regardless of distance."""
+        return self._grid[self.cell(x, y)][0]
+
+    def lookup(self, x, y):
+        """
+        Try every local layer for a mood word.
+
+        Returns:
+            str or None: The mood word, or None if only a remote call can answer
+        """
+        key = self.cell(x, y)
+
+        word, dist = self._grid[key]
+        if dist <= self.lexicon_radius:
+            self._count("lexicon_hits")
+            return word
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.counters["cache_hits"] += 1
+                return self._cache[key]
+
+        mood = self._load_persistent(key)
+        if mood is not None:
+            self._remember(key, mood)
+            self._count("persistent_hits")
+            return mood
+
+        return None
+
+    def resolve(self, x, y, fetch):
+        """
+        Resolve a mood word, calling fetch(x, y) only when no local layer can answer.
+
+        The fetch callable receives the centre of the quantized cell so the cached
+        answer is valid for every point that maps to it. Error strings returned
+        by fetch are passed through but never cached; if fetch raises
+        MoodUnavailable the nearest lexicon word is returned, also uncached, so
+        the cell goes back to the LLM once it answers again.
+        """
+        mood = self.lookup(x, y)
+        if mood is not None:
+            return mood
+
+        self._count("misses")
+        key = self.cell(x, y)
+        try:
+            mood = fetch(*key)
+        except MoodUnavailable:
+            return self._grid[key][0]
+        if mood and not mood.startswith("Error"):
+            self.store(key, mood)
+        return mood
+
+    async def resolve_async(self, x, y, fetch):
+        """Same as resolve, but awaits an async fetch coroutine on a miss."""
+        mood = self.lookup(x, y)
+        if mood is not None:
+            return mood
+
+        self._count("misses")
+        key = self.cell(x, y)
+        try:
+            mood = await fetch(*key)
+        except MoodUnavailable:
+            return self._grid[key][0]
+        if mood and not mood.startswith("Error"):
+            self.store(key, mood)
+        return mood
+
+    def resolve_many(self, points, fetch_many):
+        """
+        Resolve a list of (x, y) points, going remote once per distinct missing cell.
+
+        Args:
+            points: iterable of (x, y) pairs
+            fetch_many: callable taking a list of cell centres and returning a
+                dict {cell: mood}; cells it leaves out fall back to the nearest
+                lexicon word (uncached)
+
+        Returns:
+            list: mood words in the same order as points
+        """
+        points = list(points)
+        results = [self.lookup(x, y) for x, y in points]
+
+        missing = list(dict.fromkeys(
+            self.cell(x, y) for (x, y), mood in zip(points, results) if mood is None
+        ))
+        if missing:
+            with self._lock:
+                self.counters["misses"] += len(missing)
+            fetched = fetch_many(missing)
+            for key, mood in fetched.items():
+                if mood and not mood.startswith("Error"):
+                    self.store(key, mood)
+
+        for i, (x, y) in enumerate(points):
+            if results[i] is None:
+                key = self.cell(x, y)
+                mood = fetched.get(key)
+                results[i] = mood if mood and not mood.startswith("Error") else self._grid[key][0]
+        return results
+
+    def store(self, key, mood):
+        """Record an LLM answer for a quantized cell in both cache layers."""
+        self._remember(key, mood)
+        self._save_persistent(key, mood)
+
+    def stats(self):
+        """Return a snapshot of the hit/miss counters."""
+        with self._lock:
+            snapshot = dict(self.counters)
+            snapshot["cache_size"] = len(self._cache)
+        lookups = sum(snapshot[name] for name in self.counters)
+        snapshot["lookups"] = lookups
+        snapshot["hit_rate"] = (lookups - snapshot["misses"]) / lookups if lookups else 0.0
+        return snapshot
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _remember(self, key, mood):
+        with self._lock:
+            self._cache[key] = mood
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.cache_file, timeout=5)
+        if not self._db_ready:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS mood_cache (
+                qx INTEGER NOT NULL,
+                qy INTEGER NOT NULL,
+                mood TEXT NOT NULL,
+                PRIMARY KEY (qx, qy)
+            )
+            ''')
+            conn.commit()
+            self._db_ready = True
+        return conn
+
+    def _load_persistent(self, key):
+        if not self.cache_file:
+            return None
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT mood FROM mood_cache WHERE qx = ? AND qy = ?", key
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def _save_persistent(self, key, mood):
+        if not self.cache_file:
+            return
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO mood_cache (qx, qy, mood) VALUES (?, ?, ?)",
+                    (key[0], key[1], mood)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            pass
+
+
+# Shared resolver so every mapper instance and request reuses the same cache
+default_resolver = MoodResolver()
+
+
+def resolve_mood(x, y, fetch):
+    """Resolve coordinates through the shared resolver."""
+    return default_resolver.resolve(x, y, fetch)
+
+
+async def resolve_mood_async(x, y, fetch):
+    """Resolve coordinates through the shared resolver with an async fetch."""
+    return await default_resolver.resolve_async(x, y, fetch)
+
+
+def resolver_stats():
+    """Hit/miss counters of the shared resolver."""
+    return default_resolver.stats()
@@ -0,0 +1,89 @@
+from functools import lru_cache
+
+COORD_MIN = -100
+COORD_MAX = 100
+_SIDE = COORD_MAX - COORD_MIN + 1
+
+# Quadrant names, indexed by quadrant_index: bit 0 = negative valence, bit 1 = low energy
+QUADRANTS = [
+    "Positive emotion, High energy",
+    "Negative emotion, High energy",
+    "Positive emotion, Low energy",
+    "Negative emotion, Low energy",
+]
+
+
+def get_color_from_coordinates(x, y):
+    """Generate a color based on x,y coordinates"""
+    # Normalize coordinates from -100,100 to 0,1 range
+    x_norm = (x + 100) / 200
+    y_norm = (y + 100) / 200
+
+    # Make colors more vibrant by increasing saturation
+    h = (x_norm * 360) % 360  # Hue based on x (negative to positive)
+    s = 0.7  # Fixed saturation
+    l = 0.2 + (y_norm * 0.6)  # Lightness based on y (low to high energy)
+
+    return f"hsl({h}, {s*100}%, {l*100}%)"
+
+
+def quadrant_index(x, y):
+    """Index into QUADRANTS for a coordinate pair"""
+    return (x < 0) + 2 * (y < 0)
+
+
+def quadrant_label(x, y):
+    """Human-readable quadrant for a coordinate pair"""
+    return QUADRANTS[quadrant_index(x, y)]
+
+
+def _cell(x, y):
+    """Flat table index of the integer grid point nearest to (x, y)"""
+    qx = min(COORD_MAX, max(COORD_MIN, int(round(x))))
+    qy = min(COORD_MAX, max(COORD_MIN, int(round(y))))
+    return (qx - COORD_MIN) * _SIDE + (qy - COORD_MIN)
+
+
+@lru_cache(maxsize=None)
+def _tables():
+    """
+    Every integer grid point's colour and quadrant, built on first use.
+
+    The picker only produces integer coordinates, so lookups match the formula
+    exactly. Building takes tens of milliseconds, so it is kept off the import path.
+    """
+    color_table = [
+        get_color_from_coordinates(x, y)
+        for x in range(COORD_MIN, COORD_MAX + 1)
+        for y in range(COORD_MIN, COORD_MAX + 1)
+    ]
+    quadrant_table = [
+        QUADRANTS[quadrant_index(x, y)]
+        for x in range(COORD_MIN, COORD_MAX + 1)
+        for y in range(COORD_MIN, COORD_MAX + 1)
+    ]
+    return color_table, quadrant_table
+
+
+def color_for(x, y):
+    """Table lookup equivalent of get_color_from_coordinates (coordinates rounded to integers)"""
+    return _tables()[0][_cell(x, y)]
+
+
+def annotate_entries(entries):
+    """
+    Attach 'color' and 'quadrant' to every entry dict that has coordinates.
+
+    Done once per result set before rendering, so templates and JSON clients
+    only read precomputed strings.
+    """
+    color_table, quadrant_table = _tables()
+    for entry in entries:
+        x = entry.get('x_coordinate')
+        y = entry.get('y_coordinate')
+        if x is None or y is None:
+            continue
+        cell = _cell(x, y)
+        entry['color'] = color_table[cell]
+        entry['quadrant'] = quadrant_table[cell]
+    return entries
@@ -0,0 +1,205 @@
+"""
+Opt-in request profiling for the Flask app.
+
+Set MOODJOURNAL_PROFILE=1 to enable. Each request then gets per-phase timings
+(db, render, serialize, upstream) in a Server-Timing header. Requests slower
+than MOODJOURNAL_SLOW_MS are written to a rotating slow-request log. A sampled
+fraction of requests also runs under cProfile, and the stats are kept for the
+ones that turn out slow.
+
+When disabled nothing is registered: connections use the stock sqlite3 classes,
+and phase() hands back a shared no-op context manager.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+PROFILE_ENABLED = os.getenv("MOODJOURNAL_PROFILE", "").lower() in ("1", "true", "yes")
+
+# Requests at least this slow are logged (and their cProfile stats kept, if sampled)
+SLOW_REQUEST_MS = float(os.getenv("MOODJOURNAL_SLOW_MS", "500"))
+
+# Fraction of requests run under cProfile
+CPROFILE_SAMPLE_RATE = float(os.getenv("MOODJOURNAL_PROFILE_SAMPLE", "0.05"))
+
+PROFILE_DIR = os.getenv("MOODJOURNAL_PROFILE_DIR", "profiles")
+SLOW_LOG_FILE = os.path.join(PROFILE_DIR, "slow_requests.log")
+SLOW_LOG_BYTES = 1_000_000
+SLOW_LOG_BACKUPS = 5
+
+PHASES = ("db", "render", "serialize", "upstream")
+
+_local = threading.local()
+_NOOP = nullcontext()
+
+# cProfile allows one active profiler per process on recent Pythons
+_profiler_lock = threading.Lock()
+
+
+def add_time(name, seconds):
+    """Add seconds to the current request's phase, if a request is being profiled."""
+    timings = getattr(_local, "timings", None)
+    if timings is not None:
+        timings[name] += seconds
+
+
+@contextmanager
+def _timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - started)
+
+
+def phase(name):
+    """Context manager charging the enclosed time to a phase of the current request."""
+    if getattr(_local, "timings", None) is None:
+        return _NOOP
+    return _timed(name)
+
+
+def _timed_method(method):
+    def wrapper(self, *args):
+        started = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            add_time("db", time.perf_counter() - started)
+    return wrapper
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that charges statement execution and row fetching to the db phase."""
+    execute = _timed_method(sqlite3.Cursor.execute)
+    executemany = _timed_method(sqlite3.Cursor.executemany)
+    fetchone = _timed_method(sqlite3.Cursor.fetchone)
+    fetchmany = _timed_method(sqlite3.Cursor.fetchmany)
+    fetchall = _timed_method(sqlite3.Cursor.fetchall)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+
+def connection_factory():
+    """sqlite3.connect factory: timed connections when profiling, stock ones otherwise."""
+    return ProfiledConnection if PROFILE_ENABLED else sqlite3.Connection
+
+
+def _slow_log():
+    import logging
+    from logging.handlers import RotatingFileHandler
+
+    logger = logging.getLogger("moodjournal.slow_requests")
+    if not logger.handlers:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        handler = RotatingFileHandler(SLOW_LOG_FILE, maxBytes=SLOW_LOG_BYTES, backupCount=SLOW_LOG_BACKUPS)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def init_profiling(app):
+    """
+    Register the profiling hooks on a Flask app, if MOODJOURNAL_PROFILE is set.
+
+    Call right after creating the app so its before_request hook runs first.
+    """
+    if not PROFILE_ENABLED:
+        return
+
+    # Only paid for when profiling is switched on
+    import cProfile
+    import json
+    import random
+    from flask import before_render_template, request, template_rendered
+    from flask.json.provider import DefaultJSONProvider
+
+    slow_log = _slow_log()
+
+    class ProfiledJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            with phase("serialize"):
+                return super().dumps(obj, **kwargs)
+
+    app.json = ProfiledJSONProvider(app)
+
+    def render_started(sender, template, context, **extra):
+        _local.render_started = time.perf_counter()
+
+    def render_finished(sender, template, context, **extra):
+        add_time("render", time.perf_counter() - _local.render_started)
+
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
+
+    @app.before_request
+    def start_profile():
+        _local.timings = dict.fromkeys(PHASES, 0.0)
+        _local.profiler = None
+        if random.random() < CPROFILE_SAMPLE_RATE and _profiler_lock.acquire(blocking=False):
+            _local.profiler = cProfile.Profile()
+            _local.profiler.enable()
+        _local.started = time.perf_counter()
+
+    @app.after_request
+    def finish_profile(response):
+        timings = getattr(_local, "timings", None)
+        if timings is None:
+            return response
+        total_ms = (time.perf_counter() - _local.started) * 1000
+        profiler = _stop_profiler()
+
+        response.headers["Server-Timing"] = ", ".join(
+            [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+            + [f"total;dur={total_ms:.2f}"]
+        )
+
+        if total_ms >= SLOW_REQUEST_MS:
+            record = {
+                "method": request.method,
+                "path": request.full_path.rstrip("?"),
+                "status": response.status_code,
+                "total_ms": round(total_ms, 2),
+                "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in timings.items()},
+            }
+            if profiler is not None:
+                record["profile"] = _dump_profile(profiler, request.method, request.path)
+            slow_log.info(json.dumps(record))
+
+        _local.timings = None
+        return response
+
+    @app.teardown_request
+    def clear_profile(error=None):
+        # after_request is skipped when a view raises
+        _stop_profiler()
+        _local.timings = None
+
+
+def _stop_profiler():
+    profiler = getattr(_local, "profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _local.profiler = None
+        _profiler_lock.release()
+    return profiler
+
+
+def _dump_profile(profiler, method, path):
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{method}{path.replace('/', '_')}-{os.getpid()}.prof"
+    filename = os.path.join(PROFILE_DIR, name)
+    profiler.dump_stats(filename)
+    return filename
@@ -1,62 +1,19 @@
-import sqlite3
-from datetime import datetime
-import requests
-import json
 import os
 import random
+from llm_client import get_client, get_async_client, outcome_of
+from metrics import record_fallback
+# Storage lives in storage.py; re-exported here for existing callers
+from storage import DB_FILE, create_db, save_entry
 
 # OpenRouter API settings
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 MODEL = "anthropic/claude-3-haiku:beta"
 
-# SQLite database file
-DB_FILE = "journal.db"
+class GenericPromptError(ValueError):
+    """The LLM answered with a generic or too-short prompt."""
 
-def create_db():
-    """Creates the database and table if it doesn't exist."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # First check if the table exists
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='journal_entries'")
-    table_exists = cursor.fetchone() is not None
-    
-    if not table_exists:
-        # Create the table if it doesn't exist
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS journal_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            emotion TEXT NOT NULL,
-            prompt TEXT NOT NULL,
-            response TEXT NOT NULL,
-            x_coordinate INTEGER,
-            y_coordinate INTEGER
-        )
-        ''')
-        conn.commit()
-    else:
-        # Check if the coordinates columns exist
-        cursor.execute("PRAGMA table_info(journal_entries)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        # Add coordinates columns if they don't exist
-        if 'x_coordinate' not in columns:
-            cursor.execute('ALTER TABLE journal_entries ADD COLUMN x_coordinate INTEGER')
-        if 'y_coordinate' not in columns:
-            cursor.execute('ALTER TABLE journal_entries ADD COLUMN y_coordinate INTEGER')
-        conn.commit()
-        
-    conn.close()
-
-def generate_custom_prompt(emotion):
-    """Generates a more focused prompt based on the provided emotion using OpenRouter."""
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
+def build_prompt_payload(emotion):
+    """Builds the OpenRouter request body for a journal prompt about the given emotion."""
     # More specific system prompt with examples and constraints
     system_prompt = f"""You are a thoughtful, introspective journal prompt creator focused on the emotion: {emotion}.
     
@@ -75,7 +32,7 @@ def generate_custom_prompt(emotion):
     Please only provide the journal prompt, and no other commentary.
     """
     
-    payload = {
+    return {
         "model": MODEL,
         "messages": [
             {"role": "system", "content": system_prompt},
@@ -84,17 +41,97 @@ def generate_custom_prompt(emotion):
         "temperature": 0.7  # Increased temperature for more variation
     }
     
+def request_custom_prompt(emotion):
+    """
+    Asks OpenRouter for a journal prompt without any fallback.
+
+    Raises:
+        Exception: If the API call fails or returns an unusable prompt
+    """
+    payload = build_prompt_payload(emotion)
+    # Shared client: pooled connections, deadline, retries, and a circuit breaker
+    # that raises immediately while OpenRouter is unhealthy
+    data = get_client().chat(payload, api_key=OPENROUTER_API_KEY, deadline=20, operation="prompt")
+    prompt = data['choices'][0]['message']['content'].strip()
+    if is_generic_prompt(prompt):
+        raise GenericPromptError("LLM returned a generic or too-short prompt")
+    return prompt
+
+def generate_custom_prompt(emotion, is_fresh=None):
+    """Generates a more focused prompt based on the provided emotion using OpenRouter."""
+    try:
+        return request_custom_prompt(emotion)
+    except GenericPromptError:
+        record_fallback("prompt", "generic_prompt")
+        return use_fallback_prompt(emotion, is_fresh)
+    except Exception as e:
+        record_fallback("prompt", outcome_of(e))
+        return use_fallback_prompt(emotion, is_fresh)
+
+async def generate_custom_prompt_async(emotion, is_fresh=None):
+    """Async variant of generate_custom_prompt, used by the ASGI app."""
+    payload = build_prompt_payload(emotion)
+    
     try:
-        response = requests.post(OPENROUTER_API_URL, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()
-        data = response.json()
+        data = await get_async_client().chat(payload, api_key=OPENROUTER_API_KEY, deadline=20, operation="prompt")
         prompt = data['choices'][0]['message']['content'].strip()
         return prompt
     except Exception as e:
-        return use_fallback_prompt(emotion)
+        record_fallback("prompt", outcome_of(e))
+        return use_fallback_prompt(emotion, is_fresh)
+
+def stream_prompt(emotion, is_fresh=None):
+    """
+    Streams a prompt from OpenRouter as it is generated.
+
+    Yields:
+        tuple: ("token", text) for each piece of the LLM answer, then
+               ("done", prompt, source) with the final prompt and "llm" or
+               "fallback". If the stream fails before its first token there are
+               no token events and the fallback prompt arrives in "done"; a
+               generic or (with is_fresh) repeated answer is likewise replaced there.
+    """
+    pieces = []
+    try:
+        for text in get_client().stream_chat(build_prompt_payload(emotion), api_key=OPENROUTER_API_KEY,
+                                             operation="prompt"):
+            pieces.append(text)
+            yield ("token", text)
+    except Exception as e:
+        if not pieces:
+            record_fallback("prompt", outcome_of(e))
+            yield ("done", use_fallback_prompt(emotion, is_fresh), "fallback")
+            return
+        # Broke off mid-stream: keep what the user is already reading, if usable
+    
+    prompt = "".join(pieces).strip()
+    checked = check_prompt(emotion, prompt, is_fresh)
+    yield ("done", checked, "llm" if checked == prompt else "fallback")
+
+async def stream_prompt_async(emotion, is_fresh=None):
+    """Async variant of stream_prompt, used by the ASGI app."""
+    pieces = []
+    try:
+        async for text in get_async_client().stream_chat(build_prompt_payload(emotion), api_key=OPENROUTER_API_KEY,
+                                                         operation="prompt"):
+            pieces.append(text)
+            yield ("token", text)
+    except Exception as e:
+        if not pieces:
+            record_fallback("prompt", outcome_of(e))
+            yield ("done", use_fallback_prompt(emotion, is_fresh), "fallback")
+            return
+
+    prompt = "".join(pieces).strip()
+    checked = check_prompt(emotion, prompt, is_fresh)
+    yield ("done", checked, "llm" if checked == prompt else "fallback")
+
+def use_fallback_prompt(emotion, is_fresh=None):
+    """
+    Provides a fallback prompt if API call fails, with varied prompts based on emotion.
 
-def use_fallback_prompt(emotion):
-    """Provides a fallback prompt if API call fails, with varied prompts based on emotion."""
+    With is_fresh, prompts it rejects are skipped unless every candidate is rejected.
+    """
     emotion_prompts = {
         "happy": [
             f"What's one small thing contributing to your happiness today that you might normally overlook?",
@@ -134,35 +171,36 @@ def use_fallback_prompt(emotion):
     
     # Use emotion-specific prompts if available, otherwise use default
     prompts = emotion_prompts.get(emotion.lower(), default_prompts)
+    if is_fresh is not None:
+        prompts = [prompt for prompt in prompts if is_fresh(prompt)] or prompts
     return random.choice(prompts)
 
-def generate_prompt(emotion):
-    """Tries the API first, then falls back to custom prompts if needed."""
-    prompt = generate_custom_prompt(emotion)
-    
-    # If the prompt is the generic one or too short, use fallback
-    if prompt == "Describe how you're feeling right now" or len(prompt) < 20:
-        prompt = use_fallback_prompt(emotion)
+def generate_prompt(emotion, is_fresh=None):
+    """
+    Tries the API first, then falls back to custom prompts if needed.
+
+    is_fresh(prompt) -> bool, if given, rejects prompts too close to ones the
+    user has already answered (see similarity.prompt_filter).
+    """
+    prompt = generate_custom_prompt(emotion, is_fresh)
+    return check_prompt(emotion, prompt, is_fresh)
+
+async def generate_prompt_async(emotion, is_fresh=None):
+    """Async variant of generate_prompt."""
+    prompt = await generate_custom_prompt_async(emotion, is_fresh)
+    return check_prompt(emotion, prompt, is_fresh)
+
+def check_prompt(emotion, prompt, is_fresh=None):
+    """Replaces generic, too-short or (with is_fresh) repeated prompts with a fallback prompt."""
+    if is_generic_prompt(prompt):
+        record_fallback("prompt", "generic_prompt")
+        prompt = use_fallback_prompt(emotion, is_fresh)
+    elif is_fresh is not None and not is_fresh(prompt):
+        record_fallback("prompt", "repeat_prompt")
+        prompt = use_fallback_prompt(emotion, is_fresh)
         
     return prompt
 
-def save_entry(emotion, prompt, response, x_coordinate=None, y_coordinate=None):
-    """Saves the journal entry to the SQLite database."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # If coordinates are provided, save them too
-    if x_coordinate is not None and y_coordinate is not None:
-        cursor.execute('''
-        INSERT INTO journal_entries (timestamp, emotion, prompt, response, x_coordinate, y_coordinate)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (timestamp, emotion, prompt, response, x_coordinate, y_coordinate))
-    else:
-        cursor.execute('''
-        INSERT INTO journal_entries (timestamp, emotion, prompt, response)
-        VALUES (?, ?, ?, ?)
-        ''', (timestamp, emotion, prompt, response))
-        
-    conn.commit()
-    conn.close()
\ No newline at end of file
+def is_generic_prompt(prompt):
+    """True for the generic prompt or one too short to be useful."""
+    return prompt == "Describe how you're feeling right now" or len(prompt) < 20
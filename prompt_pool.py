@@ -0,0 +1,215 @@
+import atexit
+import threading
+import time
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt_gen import request_custom_prompt, generate_prompt, stream_prompt as stream_llm_prompt, OPENROUTER_API_KEY
+
+# Ready prompts kept per emotion, and the level that triggers a background refill
+TARGET_SIZE = 5
+LOW_WATER = 2
+
+# Emotions warmed at startup; others join the pool once requested often enough
+FREQUENT_EMOTIONS = ["happy", "sad", "angry", "anxious", "excited", "content", "calm", "tired"]
+PROMOTE_AFTER = 3
+MAX_EMOTIONS = 32
+
+# Background threads doing LLM calls for refills
+MAX_WORKERS = 2
+
+# After a failed background generation an emotion's refills pause for
+# REFILL_BACKOFF seconds, doubling per consecutive failure up to REFILL_BACKOFF_MAX,
+# so a failing upstream isn't hit target_size times per request
+REFILL_BACKOFF = 5
+REFILL_BACKOFF_MAX = 300
+
+
+class PromptPool:
+    """
+    Warm pool of LLM-generated journal prompts per emotion.
+
+    take() pops a ready prompt in constant time and schedules a background
+    refill when the emotion drops below the low-water mark. Only genuine LLM
+    prompts enter the pool; fallback prompts are never stored. A failed
+    generation puts its emotion in backoff: queued and new refills are skipped
+    until it ends.
+    """
+
+    def __init__(self, generate=request_custom_prompt, emotions=FREQUENT_EMOTIONS,
+                 target_size=TARGET_SIZE, low_water=LOW_WATER, max_workers=MAX_WORKERS):
+        self.generate = generate
+        self.target_size = target_size
+        self.low_water = low_water
+        self.max_workers = max_workers
+        self._pools = {self.key(emotion): deque() for emotion in emotions}
+        self._pending = Counter()
+        self._requests = Counter()
+        self._failed = Counter()
+        self._retry_at = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._started = False
+        self._closed = False
+        self.counters = {"hits": 0, "misses": 0, "generated": 0, "failures": 0, "skipped": 0}
+
+    @staticmethod
+    def key(emotion):
+        return emotion.strip().lower()
+
+    def start(self):
+        """Fill every known emotion up to the target size in the background, once."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for emotion in list(self._pools):
+            self.refill(emotion)
+
+    def take(self, emotion, accept=None):
+        """
+        Pop a ready prompt for the emotion.
+
+        accept(prompt) -> bool, if given, skips prompts it rejects; they stay
+        pooled for other journals. It runs under the pool lock, so keep it cheap.
+
+        Returns:
+            str or None: A pooled prompt, or None if the pool has none right now
+        """
+        key = self.key(emotion)
+        with self._lock:
+            self._requests[key] += 1
+            pool = self._pools.get(key)
+            if pool is None and self._requests[key] >= PROMOTE_AFTER and len(self._pools) < MAX_EMOTIONS:
+                pool = self._pools[key] = deque()
+            prompt = None
+            for candidate in pool or ():
+                if accept is None or accept(candidate):
+                    prompt = candidate
+                    pool.remove(candidate)
+                    break
+            self.counters["hits" if prompt else "misses"] += 1
+
+        if pool is not None and len(pool) < self.low_water:
+            self.refill(key)
+        return prompt
+
+    def refill(self, emotion):
+        """Schedule enough background generations to bring the emotion back to target."""
+        key = self.key(emotion)
+        with self._lock:
+            if self._closed or key not in self._pools or self._backing_off(key):
+                return
+            missing = self.target_size - len(self._pools[key]) - self._pending[key]
+            if missing <= 0:
+                return
+            self._pending[key] += missing
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="prompt-pool"
+                )
+            executor = self._executor
+
+        for _ in range(missing):
+            executor.submit(self._fill_one, key)
+
+    def _backing_off(self, key):
+        return time.monotonic() < self._retry_at.get(key, 0)
+
+    def _fill_one(self, key):
+        with self._lock:
+            if self._backing_off(key):
+                self._pending[key] -= 1
+                self.counters["skipped"] += 1
+                return
+
+        try:
+            prompt = self.generate(key)
+        except Exception:
+            with self._lock:
+                self._pending[key] -= 1
+                self.counters["failures"] += 1
+                self._failed[key] += 1
+                delay = min(REFILL_BACKOFF_MAX, REFILL_BACKOFF * 2 ** (self._failed[key] - 1))
+                self._retry_at[key] = time.monotonic() + delay
+            return
+
+        with self._lock:
+            self._pending[key] -= 1
+            self._pools[key].append(prompt)
+            self.counters["generated"] += 1
+            self._failed[key] = 0
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self.counters)
+            snapshot["ready"] = {key: len(pool) for key, pool in self._pools.items()}
+            snapshot["pending"] = sum(self._pending.values())
+        return snapshot
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            executor = self._executor
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+default_pool = PromptPool()
+atexit.register(default_pool.shutdown)
+
+
+def start_pool():
+    """
+    Warm the shared pool, if there is an API key to generate prompts with.
+
+    Idempotent; called on the first request (or ASGI startup) rather than at
+    import, so importing the app never makes LLM calls.
+    """
+    if OPENROUTER_API_KEY:
+        default_pool.start()
+
+
+def recent_prompt_filter(db_file):
+    """
+    is_fresh(prompt) check against db_file's recent prompts (see similarity.prompt_filter).
+
+    Returns:
+        callable or None: None without a journal, or if its index can't be read
+    """
+    if db_file is None:
+        return None
+    try:
+        # numpy is only imported once a journal's prompts are first checked
+        from similarity import prompt_filter
+        return prompt_filter(db_file)
+    except Exception:
+        # A prompt that might repeat beats no prompt
+        return None
+
+
+def get_prompt(emotion, db_file=None):
+    """
+    Serve a pooled prompt, falling back to a synchronous generate_prompt when empty.
+
+    With db_file, prompts too similar to that journal's recent ones are skipped.
+    """
+    is_fresh = recent_prompt_filter(db_file)
+    prompt = default_pool.take(emotion, is_fresh)
+    if prompt is None:
+        prompt = generate_prompt(emotion, is_fresh)
+    return prompt
+
+
+def stream_prompt(emotion, db_file=None):
+    """
+    Streaming counterpart of get_prompt, yielding prompt_gen.stream_prompt events.
+
+    A pooled prompt is served as a single ("done", prompt, "pool") event.
+    """
+    is_fresh = recent_prompt_filter(db_file)
+    prompt = default_pool.take(emotion, is_fresh)
+    if prompt is not None:
+        yield ("done", prompt, "pool")
+        return
+    yield from stream_llm_prompt(emotion, is_fresh)
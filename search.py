@@ -0,0 +1,65 @@
+import re
+
+from storage import DB_FILE, get_connection
+
+# Default and maximum number of hits returned per search
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# Markers wrapped around matched terms in snippets, and snippet length in tokens
+SNIPPET_START = '['
+SNIPPET_END = ']'
+SNIPPET_TOKENS = 12
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def to_match_query(text):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted term, so punctuation and FTS operators typed by
+    the user can't cause syntax errors. A trailing '*' on a word keeps prefix
+    matching. Terms are ANDed.
+
+    Returns:
+        str or None: The MATCH expression, or None if the text has no words
+    """
+    terms = []
+    for raw in text.split():
+        words = _TOKEN.findall(raw)
+        for word in words:
+            terms.append(f'"{word}"')
+        if words and raw.endswith('*'):
+            terms[-1] += '*'
+    return ' '.join(terms) or None
+
+
+def search_entries(query, limit=SEARCH_LIMIT, db_file=DB_FILE):
+    """
+    Full-text search over entry prompts and responses, best matches first.
+
+    Returns:
+        list: dicts with id, timestamp, emotion, prompt_snippet, response_snippet and
+              rank (bm25, lower is more relevant)
+    """
+    match = to_match_query(query)
+    if match is None:
+        return []
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+
+    cursor = get_connection(db_file).execute('''
+    SELECT e.id, e.timestamp, e.emotion,
+           snippet(journal_fts, 0, ?, ?, '...', ?) AS prompt_snippet,
+           snippet(journal_fts, 1, ?, ?, '...', ?) AS response_snippet,
+           bm25(journal_fts) AS rank
+    FROM journal_fts
+    JOIN journal_entries e ON e.id = journal_fts.rowid
+    WHERE journal_fts MATCH ?
+    ORDER BY rank
+    LIMIT ?
+    ''', (SNIPPET_START, SNIPPET_END, SNIPPET_TOKENS,
+          SNIPPET_START, SNIPPET_END, SNIPPET_TOKENS,
+          match, limit))
+
+    return [dict(row) for row in cursor.fetchall()]
@@ -0,0 +1,96 @@
+import os
+import re
+import threading
+import zlib
+
+from storage import DB_FILE, create_db
+
+# Request header naming the journal's owner. Requests without it use DB_FILE,
+# so a single-user install behaves exactly as before.
+USER_HEADER = "X-Journal-User"
+
+# The app does no authentication of its own: USER_HEADER is only honoured on
+# requests from these addresses (comma-separated in JOURNAL_TRUSTED_PROXIES),
+# which must be an authenticating reverse proxy that strips any client-sent
+# USER_HEADER and sets it from the signed-in user.
+TRUSTED_PROXIES = frozenset(
+    addr.strip() for addr in os.getenv("JOURNAL_TRUSTED_PROXIES", "").split(",") if addr.strip()
+)
+
+# One SQLite file per user under SHARD_DIR, spread over SHARD_FANOUT
+# subdirectories so no single directory grows huge
+SHARD_DIR = os.getenv("JOURNAL_SHARD_DIR", "journals")
+SHARD_FANOUT = 256
+
+USER_ID_PATTERN = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+
+def shard_bucket(key):
+    """Stable bucket number for a string, the same in every process."""
+    return zlib.crc32(key.encode())
+
+
+class ShardRouter:
+    """
+    Maps users to their own journal database and creates it on first access.
+
+    Each user's writes lock only their own file, so write throughput grows with
+    the number of active users. Open handles are bounded by storage's per-thread
+    connection LRU.
+    """
+
+    def __init__(self, shard_dir=SHARD_DIR, default_db=DB_FILE, fanout=SHARD_FANOUT):
+        self.shard_dir = shard_dir
+        self.default_db = default_db
+        self.fanout = fanout
+        self._ready = set()
+        self._lock = threading.Lock()
+
+    def path_for(self, user):
+        """
+        Database file for a user id, or the default journal for None.
+
+        Raises:
+            ValueError: If the user id has characters unsafe in a file name
+        """
+        if user is None:
+            return self.default_db
+        if not USER_ID_PATTERN.fullmatch(user) or user.strip(".") == "":
+            raise ValueError(f"Invalid user id: {user!r}")
+        subdir = f"{shard_bucket(user) % self.fanout:02x}"
+        return os.path.join(self.shard_dir, subdir, f"{user}.db")
+
+    def db_for(self, user):
+        """Path of the user's database, created and migrated if this is its first use."""
+        db_file = self.path_for(user)
+        if db_file not in self._ready:
+            with self._lock:
+                if db_file not in self._ready:
+                    directory = os.path.dirname(db_file)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    create_db(db_file)
+                    self._ready.add(db_file)
+        return db_file
+
+
+default_router = ShardRouter()
+
+
+def request_user(user, remote_addr, trusted_proxies=TRUSTED_PROXIES):
+    """
+    User id a web request may act as: its USER_HEADER value, if a trusted proxy sent it.
+
+    Raises:
+        PermissionError: If the header came from an address not in trusted_proxies
+    """
+    if user is None:
+        return None
+    if remote_addr not in trusted_proxies:
+        raise PermissionError(f"{USER_HEADER} is only accepted from a trusted proxy")
+    return user
+
+
+def db_for_user(user):
+    """Journal database for a user id via the shared router (None = the default journal)."""
+    return default_router.db_for(user)
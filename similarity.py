@@ -0,0 +1,442 @@
+"""
+Similarity index over journal entries, for related entries and prompt dedup.
+
+Each entry is embedded as hashed TF-IDF vectors: words are hashed into DIM
+signed buckets, weighted by sublinear term frequency and the bucket's inverse
+document frequency, and L2-normalized, so a dot product is a cosine similarity.
+An entry gets two vectors, one for its prompt alone and one for prompt plus
+response.
+
+DIM trades disk for precision. Unrelated words sharing a bucket add noise to
+every score: with 256 buckets unrelated entries scored up to 0.3, above
+genuinely related ones. 2048 buckets keep that noise below about 0.15 (on
+5,000 entries of random vocabulary), under MIN_RELATED_SCORE, at 16 KB of
+vectors per entry, i.e. about 160 MB for 10,000 entries.
+
+Vectors are float32 rows of a memory-mapped file next to the database
+(journal.db -> journal.db.vectors), at row entry id - 1. A JSON sidecar holds
+the highest indexed id and the document frequencies. The index catches up
+incrementally from the database: the ingest writer catches it up after every
+committed batch, and every query catches up first, so entries written by other
+paths (imports, the CLI) are picked up too. Catching up indexes at most
+CATCH_UP_ROWS entries inline; an index further behind (after a bulk import or
+a deploy onto an existing journal) is backfilled by a background thread while
+queries answer from what is indexed so far. IDF is fixed when an entry is
+indexed; rebuild() re-weights everything with current frequencies.
+"""
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from storage import DB_FILE, get_connection
+
+# Hashed buckets per vector; 16 KB per entry for both vectors (see above).
+# Changing it resets existing index files, which are then rebuilt
+DIM = 2048
+
+# Vector slots per entry
+PROMPT = 0
+ENTRY = 1
+
+# Rows allocated for a new vectors file; the file doubles whenever it fills
+INITIAL_CAPACITY = 128
+
+# Entries read from the database per step while catching up
+SYNC_BATCH = 2000
+
+# Most entries a request or ingest batch indexes itself (a little over one full
+# ingest batch); more missing entries are left to the background backfill
+CATCH_UP_ROWS = 300
+
+# Entries the backfill indexes per hold of the index lock, so queries arriving
+# meanwhile wait tens of milliseconds at most
+BACKFILL_STEP = 500
+
+# A prompt at least this similar to one of the journal's last RECENT_PROMPTS
+# prompts counts as a repeat
+RECENT_PROMPTS = 30
+REPEAT_THRESHOLD = 0.75
+
+# Default and maximum number of related entries, and the least similarity shown:
+# above the bucket-collision noise floor; entries sharing about 30% of their
+# words score over it
+RELATED_LIMIT = 5
+MAX_RELATED_LIMIT = 20
+MIN_RELATED_SCORE = 0.2
+
+# Indexes kept open per process; with one database per user the least
+# recently used are dropped beyond this
+MAX_OPEN_INDEXES = 64
+
+PREVIEW_CHARS = 280
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Words that say nothing about what an entry is about
+STOPWORDS = frozenset("""
+a about after again all am an and any are as at be because been before being
+but by can could did do does doing for from had has have having he her here
+him his how i if in into is it its just me more most my myself no not now of
+on once only or other our out over own same she should so some such than that
+the their them then there these they this those through to too under until up
+very was we were what when where which while who why will with would you your
+""".split())
+
+
+def tokenize(text):
+    """Lowercase words of text, minus stopwords and single characters"""
+    return [word for word in _TOKEN.findall((text or "").lower())
+            if len(word) > 1 and word not in STOPWORDS]
+
+
+@lru_cache(maxsize=65536)
+def _feature(word):
+    """Bucket and sign of a word; crc32 so files stay valid across processes"""
+    h = zlib.crc32(word.encode("utf-8"))
+    return h % DIM, 1.0 if h & 0x80000000 else -1.0
+
+
+def term_frequencies(texts):
+    """
+    Signed, sublinear term frequencies of texts in hashed buckets.
+
+    Returns:
+        numpy.ndarray: float32 array of shape (len(texts), DIM)
+    """
+    tf = np.zeros((len(texts), DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        counts = {}
+        for word in tokenize(text):
+            counts[word] = counts.get(word, 0) + 1
+        for word, count in counts.items():
+            bucket, sign = _feature(word)
+            tf[i, bucket] += sign * (1.0 + math.log(count))
+    return tf
+
+
+def normalize(vectors):
+    """L2-normalize rows in place; all-zero rows stay zero"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+class SimilarityIndex:
+    """
+    Memory-mapped TF-IDF vectors for one journal database.
+
+    Safe to share between threads. Processes sharing a database reload the
+    sidecar when another process has advanced it; both write identical rows
+    for the same entries, so a race costs at most slightly skewed frequencies.
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.path = db_file + ".vectors"
+        self.meta_path = self.path + ".json"
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._meta = None
+        self._meta_mtime = None
+        self._backfilling = False
+
+    def sync(self):
+        """
+        Index entries added to the database since the last sync.
+
+        Returns:
+            int: Number of entries indexed
+        """
+        with self._lock:
+            return self._sync()
+
+    def catch_up(self):
+        """
+        Index a few new entries inline, or start a background backfill if many are missing.
+
+        Returns:
+            bool: Whether the index is now current
+        """
+        with self._lock:
+            current = self._catch_up()
+        if not current:
+            self._start_backfill()
+        return current
+
+    def rebuild(self):
+        """Drop the index files and index every entry again with current frequencies."""
+        with self._lock:
+            self._vectors = self._meta = self._meta_mtime = None
+            for path in (self.path, self.meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return self._sync()
+
+    def related(self, entry_id, limit=RELATED_LIMIT):
+        """
+        Entries whose prompt and response are most similar to the given entry's.
+
+        Returns:
+            list: (entry_id, score) pairs, best first, scores above MIN_RELATED_SCORE
+        """
+        with self._lock:
+            current = self._catch_up()
+            count = self._meta["last_id"]
+            if 0 < entry_id <= count:
+                entries = self._vectors[:count, ENTRY]
+                scores = entries @ entries[entry_id - 1]
+                scores[entry_id - 1] = -1.0
+            else:
+                scores = None
+        if not current:
+            # Entries past the backfill get their related entries once it reaches them
+            self._start_backfill()
+        return [] if scores is None else top_k(scores, limit, MIN_RELATED_SCORE)
+
+    def recent_prompts(self, recent=RECENT_PROMPTS):
+        """
+        Snapshot of the journal's latest prompt vectors and the weights to compare with them.
+
+        Returns:
+            tuple: (float32 array of up to `recent` prompt vectors, IDF weights)
+        """
+        with self._lock:
+            current = self._catch_up()
+            idf = self._idf()
+            if current:
+                count = self._meta["last_id"]
+                return np.array(self._vectors[max(0, count - recent):count, PROMPT]), idf
+
+        # Far behind: embed the latest prompts straight from the database
+        self._start_backfill()
+        rows = get_connection(self.db_file).execute('''
+        SELECT prompt FROM journal_entries ORDER BY id DESC LIMIT ?
+        ''', (recent,)).fetchall()
+        return normalize(term_frequencies([row["prompt"] for row in rows]) * idf), idf
+
+    def _catch_up(self):
+        """Index up to CATCH_UP_ROWS new entries; True if none are left. Lock held."""
+        self._sync(CATCH_UP_ROWS)
+        newest = get_connection(self.db_file).execute(
+            "SELECT max(id) FROM journal_entries"
+        ).fetchone()[0]
+        return (newest or 0) <= self._meta["last_id"]
+
+    def _start_backfill(self):
+        with self._lock:
+            if self._backfilling:
+                return
+            self._backfilling = True
+        threading.Thread(target=self._backfill, name="similarity-backfill", daemon=True).start()
+
+    def _backfill(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._sync(BACKFILL_STEP):
+                        return
+        except Exception:
+            # Left for the next catch_up or `main.py rebuild-index`
+            return
+        finally:
+            with self._lock:
+                self._backfilling = False
+
+    def _sync(self, limit=None):
+        """Index up to limit (default: all) entries added since the last sync. Lock held."""
+        self._load()
+        conn = get_connection(self.db_file)
+        added = 0
+        while limit is None or added < limit:
+            step = SYNC_BATCH if limit is None else min(SYNC_BATCH, limit - added)
+            rows = conn.execute('''
+            SELECT id, prompt, response
+            FROM journal_entries
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+            ''', (self._meta["last_id"], step)).fetchall()
+            if not rows:
+                break
+            self._add(rows)
+            added += len(rows)
+        if added:
+            # No msync: mapped pages are already visible to other processes. An
+            # OS crash can lose recent rows; `main.py rebuild-index` restores them
+            self._save_meta()
+        return added
+
+    def _add(self, rows):
+        rows_at = np.array([row["id"] for row in rows]) - 1
+        prompts = term_frequencies([row["prompt"] for row in rows])
+        entries = term_frequencies([f"{row['prompt']}\n{row['response']}" for row in rows])
+
+        meta = self._meta
+        meta["docs"] += len(rows)
+        meta["df"] = (np.array(meta["df"]) + np.count_nonzero(entries, axis=0)).tolist()
+        idf = self._idf()
+
+        self._reserve(int(rows_at[-1]) + 1)
+        self._vectors[rows_at, PROMPT] = normalize(prompts * idf)
+        self._vectors[rows_at, ENTRY] = normalize(entries * idf)
+        meta["last_id"] = int(rows_at[-1]) + 1
+
+    def _idf(self):
+        df = np.array(self._meta["df"], dtype=np.float32)
+        return np.log((1 + self._meta["docs"]) / (1 + df)) + 1
+
+    def _load(self):
+        """Open the index files, or reopen them if another process has written since."""
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._meta is not None and mtime == self._meta_mtime:
+            return
+
+        meta = None
+        if mtime is not None and os.path.exists(self.path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta.get("dim") != DIM:
+                meta = None
+        if meta is None:
+            meta = {"dim": DIM, "last_id": 0, "docs": 0, "df": [0] * DIM}
+            with open(self.path, "wb") as f:
+                f.truncate(INITIAL_CAPACITY * 2 * DIM * 4)
+        self._meta = meta
+        self._meta_mtime = mtime
+        self._map()
+
+    def _map(self):
+        rows = os.path.getsize(self.path) // (2 * DIM * 4)
+        self._vectors = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(rows, 2, DIM))
+
+    def _reserve(self, rows):
+        """Grow the vectors file to hold at least rows entries, doubling its capacity."""
+        capacity = len(self._vectors)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        self._vectors.flush()
+        self._vectors = None
+        with open(self.path, "r+b") as f:
+            f.truncate(capacity * 2 * DIM * 4)
+        self._map()
+
+    def _save_meta(self):
+        temp = self.meta_path + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(self._meta, f)
+        os.replace(temp, self.meta_path)
+        self._meta_mtime = os.stat(self.meta_path).st_mtime_ns
+
+
+def top_k(scores, k, min_score):
+    """Indices (as entry ids) and scores of the k best scores above min_score, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return []
+    best = np.argpartition(scores, -k)[-k:]
+    best = best[np.argsort(scores[best])[::-1]]
+    return [(int(i) + 1, float(scores[i])) for i in best if scores[i] > min_score]
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def index_for(db_file=DB_FILE):
+    """The shared SimilarityIndex for db_file."""
+    with _indexes_lock:
+        index = _indexes.get(db_file)
+        if index is None:
+            index = _indexes[db_file] = SimilarityIndex(db_file)
+            while len(_indexes) > MAX_OPEN_INDEXES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(db_file)
+        return index
+
+
+def sync_index(db_file=DB_FILE):
+    """Bring db_file's index up to date with its entries."""
+    return index_for(db_file).sync()
+
+
+def catch_up_index(db_file=DB_FILE):
+    """Index db_file's new entries, inline if few and in the background if many."""
+    return index_for(db_file).catch_up()
+
+
+def rebuild_index(db_file=DB_FILE):
+    """Re-index every entry of db_file from scratch."""
+    return index_for(db_file).rebuild()
+
+
+def related_entries(entry_id, limit=RELATED_LIMIT, db_file=DB_FILE):
+    """
+    Past entries most similar to the given one.
+
+    Returns:
+        list: dicts with id, timestamp, emotion, prompt, preview, truncated and
+              score (cosine similarity), most similar first
+    """
+    limit = max(1, min(limit, MAX_RELATED_LIMIT))
+    matches = index_for(db_file).related(entry_id, limit)
+    if not matches:
+        return []
+
+    scores = dict(matches)
+    placeholders = ", ".join("?" * len(scores))
+    rows = get_connection(db_file).execute(f'''
+    SELECT id, timestamp, emotion, prompt,
+           substr(response, 1, {PREVIEW_CHARS}) AS preview,
+           length(response) > {PREVIEW_CHARS} AS truncated
+    FROM journal_entries
+    WHERE id IN ({placeholders})
+    ''', list(scores)).fetchall()
+
+    entries = [dict(row, truncated=bool(row["truncated"]), score=round(scores[row["id"]], 4))
+               for row in rows]
+    return sorted(entries, key=lambda entry: entry["score"], reverse=True)
+
+
+def prompt_similarity(prompts, history, idf):
+    """
+    Highest cosine similarity of each prompt to any of the history vectors.
+
+    Returns:
+        numpy.ndarray: One score per prompt, 0 against an empty history
+    """
+    if not len(history):
+        return np.zeros(len(prompts), dtype=np.float32)
+    query = normalize(term_frequencies(prompts) * idf)
+    return (query @ history.T).max(axis=1)
+
+
+def prompt_filter(db_file=DB_FILE, threshold=REPEAT_THRESHOLD):
+    """
+    Build a check for prompts that would repeat db_file's recent prompts.
+
+    The recent prompts are read once, so the check itself is a small matrix
+    product and cheap enough to run under a lock.
+
+    Returns:
+        callable: is_fresh(prompt) -> bool, False when the prompt is at least
+                  threshold similar to one of the last RECENT_PROMPTS prompts
+    """
+    history, idf = index_for(db_file).recent_prompts()
+
+    def is_fresh(prompt):
+        return bool(prompt_similarity([prompt], history, idf)[0] < threshold)
+
+    return is_fresh
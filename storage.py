@@ -0,0 +1,402 @@
+import calendar
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+from profiling import connection_factory
+
+# SQLite database file
+DB_FILE = "journal.db"
+
+# How long a connection waits on a locked database before raising "database is locked"
+BUSY_TIMEOUT_MS = 5000
+
+# Applied to every connection. WAL lets readers run alongside a writer, and
+# synchronous=NORMAL is durable across application crashes in WAL mode.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,      # negative = KiB, so ~16 MB of page cache
+    "mmap_size": 134217728,    # 128 MB memory-mapped reads
+    "temp_store": "MEMORY",
+    "busy_timeout": BUSY_TIMEOUT_MS,
+}
+
+# Bumped whenever create_db gains a migration; stored in PRAGMA user_version
+SCHEMA_VERSION = 5
+
+# Open connections kept per thread; with one database per user the least
+# recently used are closed beyond this
+MAX_OPEN_CONNECTIONS = 64
+
+_local = threading.local()
+
+# Databases already confirmed to be at SCHEMA_VERSION by this process
+_current_schemas = set()
+
+
+def connect(db_file=DB_FILE):
+    """Open a new connection with the journal pragmas applied."""
+    # isolation_level=None: autocommit for reads, explicit BEGIN for writes (see transaction)
+    conn = sqlite3.connect(
+        db_file,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        check_same_thread=False,
+        factory=connection_factory()
+    )
+    conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def get_connection(db_file=DB_FILE):
+    """
+    Return this thread's connection to db_file, opening it on first use.
+
+    At most MAX_OPEN_CONNECTIONS stay open per thread; opening another closes
+    the least recently used one.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = OrderedDict()
+    conn = connections.get(db_file)
+    if conn is None:
+        conn = connections[db_file] = connect(db_file)
+        while len(connections) > MAX_OPEN_CONNECTIONS:
+            connections.popitem(last=False)[1].close()
+    else:
+        connections.move_to_end(db_file)
+    return conn
+
+
+def close_connections():
+    """Close every connection opened by the current thread."""
+    connections = getattr(_local, "connections", {})
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+
+@contextmanager
+def transaction(db_file=DB_FILE):
+    """
+    Run a write transaction on this thread's connection.
+
+    BEGIN IMMEDIATE takes the write lock up front, so concurrent writers queue on
+    the busy timeout instead of failing on a read-to-write lock upgrade.
+    """
+    conn = get_connection(db_file)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+
+
+def to_epoch(dt):
+    """
+    Convert a naive datetime to the integer stored in journal_entries.ts_epoch.
+
+    The wall-clock time is read as UTC, matching SQLite's strftime('%s', timestamp)
+    on the TEXT column, so Python- and SQL-computed values always agree.
+    """
+    return calendar.timegm(dt.timetuple())
+
+
+def _migrate_ts_epoch(cursor):
+    """v1: indexed integer epoch next to the TEXT timestamp for range queries."""
+    cursor.execute("PRAGMA table_info(journal_entries)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'ts_epoch' not in columns:
+        cursor.execute('ALTER TABLE journal_entries ADD COLUMN ts_epoch INTEGER')
+
+    cursor.execute('''
+    UPDATE journal_entries
+    SET ts_epoch = CAST(strftime('%s', timestamp) AS INTEGER)
+    WHERE ts_epoch IS NULL
+    ''')
+
+    # Covers range filters on time plus per-emotion counts without touching the table
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_journal_entries_ts_emotion
+    ON journal_entries (ts_epoch, emotion)
+    ''')
+
+    # Rows inserted by tools that only know the TEXT column still get an epoch
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS journal_entries_fill_ts_epoch
+    AFTER INSERT ON journal_entries
+    WHEN NEW.ts_epoch IS NULL
+    BEGIN
+        UPDATE journal_entries
+        SET ts_epoch = CAST(strftime('%s', NEW.timestamp) AS INTEGER)
+        WHERE id = NEW.id;
+    END
+    ''')
+
+
+def _migrate_keyset_index(cursor):
+    """v2: (ts_epoch, id) ordering for keyset pagination of the entry list."""
+    # id is the rowid, which SQLite appends to every index entry implicitly
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_journal_entries_ts
+    ON journal_entries (ts_epoch)
+    ''')
+
+
+def _migrate_daily_rollup(cursor):
+    """v3: per-day, per-emotion counts and coordinate sums maintained by save_entry."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS mood_daily_rollup (
+        day TEXT NOT NULL,
+        emotion TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        coord_count INTEGER NOT NULL,
+        sum_x REAL NOT NULL,
+        sum_y REAL NOT NULL,
+        PRIMARY KEY (day, emotion)
+    ) WITHOUT ROWID
+    ''')
+    _rebuild_rollup(cursor)
+
+
+def _migrate_full_text_search(cursor):
+    """v4: FTS5 index over prompt/response, kept in sync with journal_entries by triggers."""
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS journal_fts USING fts5(
+        prompt,
+        response,
+        content='journal_entries',
+        content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS journal_entries_fts_insert
+    AFTER INSERT ON journal_entries
+    BEGIN
+        INSERT INTO journal_fts (rowid, prompt, response)
+        VALUES (NEW.id, NEW.prompt, NEW.response);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS journal_entries_fts_delete
+    AFTER DELETE ON journal_entries
+    BEGIN
+        INSERT INTO journal_fts (journal_fts, rowid, prompt, response)
+        VALUES ('delete', OLD.id, OLD.prompt, OLD.response);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS journal_entries_fts_update
+    AFTER UPDATE OF prompt, response ON journal_entries
+    BEGIN
+        INSERT INTO journal_fts (journal_fts, rowid, prompt, response)
+        VALUES ('delete', OLD.id, OLD.prompt, OLD.response);
+        INSERT INTO journal_fts (rowid, prompt, response)
+        VALUES (NEW.id, NEW.prompt, NEW.response);
+    END
+    ''')
+    # Index the rows that existed before the triggers
+    cursor.execute("INSERT INTO journal_fts (journal_fts) VALUES ('rebuild')")
+
+
+def _migrate_data_version(cursor):
+    """v5: journal_meta with a data_version counter bumped by every write."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS journal_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    INSERT OR IGNORE INTO journal_meta (key, value)
+    VALUES ('data_version', 0), ('last_modified', ?)
+    ''', (int(time.time()),))
+
+
+# (version, migration) pairs applied in order by create_db
+MIGRATIONS = [
+    (1, _migrate_ts_epoch),
+    (2, _migrate_keyset_index),
+    (3, _migrate_daily_rollup),
+    (4, _migrate_full_text_search),
+    (5, _migrate_data_version),
+]
+
+
+def schema_is_current(db_file=DB_FILE):
+    """
+    True if db_file is already at SCHEMA_VERSION.
+
+    One PRAGMA user_version read the first time, then remembered for the rest
+    of the process.
+    """
+    if db_file in _current_schemas:
+        return True
+    if get_connection(db_file).execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        _current_schemas.add(db_file)
+        return True
+    return False
+
+
+def create_db(db_file=DB_FILE):
+    """Creates the database and table if it doesn't exist."""
+    # Up-to-date databases skip the write transaction and table_info probes entirely
+    if schema_is_current(db_file):
+        return
+
+    with transaction(db_file) as conn:
+        cursor = conn.cursor()
+
+        # First check if the table exists
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='journal_entries'")
+        table_exists = cursor.fetchone() is not None
+
+        if not table_exists:
+            # Create the table if it doesn't exist
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS journal_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                emotion TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                x_coordinate INTEGER,
+                y_coordinate INTEGER
+            )
+            ''')
+        else:
+            # Check if the coordinates columns exist
+            cursor.execute("PRAGMA table_info(journal_entries)")
+            columns = [column[1] for column in cursor.fetchall()]
+
+            # Add coordinates columns if they don't exist
+            if 'x_coordinate' not in columns:
+                cursor.execute('ALTER TABLE journal_entries ADD COLUMN x_coordinate INTEGER')
+            if 'y_coordinate' not in columns:
+                cursor.execute('ALTER TABLE journal_entries ADD COLUMN y_coordinate INTEGER')
+
+        # Bring older journal.db files up to the current schema
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for target, migrate in MIGRATIONS:
+            if version < target:
+                migrate(cursor)
+        if version < SCHEMA_VERSION:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    _current_schemas.add(db_file)
+
+
+def _rebuild_rollup(cursor):
+    cursor.execute("DELETE FROM mood_daily_rollup")
+    cursor.execute('''
+    INSERT INTO mood_daily_rollup (day, emotion, count, coord_count, sum_x, sum_y)
+    SELECT date(ts_epoch, 'unixepoch'), emotion, COUNT(*),
+           COUNT(x_coordinate + y_coordinate),
+           COALESCE(SUM(CASE WHEN y_coordinate IS NOT NULL THEN x_coordinate END), 0),
+           COALESCE(SUM(CASE WHEN x_coordinate IS NOT NULL THEN y_coordinate END), 0)
+    FROM journal_entries
+    GROUP BY 1, 2
+    ''')
+
+
+def rebuild_rollup(db_file=DB_FILE):
+    """Recompute mood_daily_rollup from journal_entries, e.g. after editing rows by hand."""
+    with transaction(db_file) as conn:
+        _rebuild_rollup(conn.cursor())
+        bump_data_version(conn)
+
+
+def bump_data_version(conn):
+    """
+    Mark the journal as changed. Call inside every write transaction.
+
+    Anything cached against get_data_version (rendered pages, ETags) is
+    invalidated by the new value.
+    """
+    conn.execute("UPDATE journal_meta SET value = value + 1 WHERE key = 'data_version'")
+    conn.execute("UPDATE journal_meta SET value = ? WHERE key = 'last_modified'", (int(time.time()),))
+
+
+def get_data_version(db_file=DB_FILE):
+    """
+    Return (data_version, last_modified) for the journal.
+
+    A single primary-key read, cheap enough to run on every request.
+    last_modified is a Unix timestamp.
+    """
+    rows = dict(get_connection(db_file).execute(
+        "SELECT key, value FROM journal_meta WHERE key IN ('data_version', 'last_modified')"
+    ).fetchall())
+    return rows.get('data_version', 0), rows.get('last_modified', 0)
+
+
+def update_rollup(conn, rows):
+    """
+    Fold newly inserted entries into mood_daily_rollup.
+
+    Must run inside the transaction that inserted them so the rollup never
+    drifts from journal_entries.
+
+    Args:
+        rows: iterable of (ts_epoch, emotion, x_coordinate, y_coordinate)
+    """
+    conn.executemany('''
+    INSERT INTO mood_daily_rollup (day, emotion, count, coord_count, sum_x, sum_y)
+    VALUES (date(?1, 'unixepoch'), ?2, 1, ?3 IS NOT NULL, COALESCE(?3, 0), COALESCE(?4, 0))
+    ON CONFLICT (day, emotion) DO UPDATE SET
+        count = count + 1,
+        coord_count = coord_count + excluded.coord_count,
+        sum_x = sum_x + excluded.sum_x,
+        sum_y = sum_y + excluded.sum_y
+    ''', rows)
+
+
+def entry_row(emotion, prompt, response, x_coordinate=None, y_coordinate=None, when=None):
+    """
+    Build the journal_entries row for an entry, timestamped now unless given.
+
+    Returns:
+        tuple: (timestamp, ts_epoch, emotion, prompt, response, x_coordinate, y_coordinate)
+    """
+    when = when or datetime.now()
+
+    # Coordinates are only stored as a pair
+    if x_coordinate is None or y_coordinate is None:
+        x_coordinate = y_coordinate = None
+
+    return (when.strftime("%Y-%m-%d %H:%M:%S"), to_epoch(when),
+            emotion, prompt, response, x_coordinate, y_coordinate)
+
+
+def save_entries(rows, db_file=DB_FILE):
+    """
+    Insert many entry rows (see entry_row) in one transaction.
+
+    One commit for the whole batch, with the rollup and data version updated
+    alongside, so bulk writers pay the commit cost once.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    with transaction(db_file) as conn:
+        conn.executemany('''
+        INSERT INTO journal_entries (timestamp, ts_epoch, emotion, prompt, response, x_coordinate, y_coordinate)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        update_rollup(conn, [(row[1], row[2], row[5], row[6]) for row in rows])
+        bump_data_version(conn)
+
+
+def save_entry(emotion, prompt, response, x_coordinate=None, y_coordinate=None, db_file=DB_FILE):
+    """Saves the journal entry to the SQLite database."""
+    save_entries([entry_row(emotion, prompt, response, x_coordinate, y_coordinate)], db_file)